@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmark of the lastfmplus toptags response parsers.
+
+Times every parser on each fixture in the fixture directory (``<name>.xml`` and ``<name>.json``
+pairs) and prints the mean parse time per response.
+
+    python benchmarks/lastfmplus/bench_parsers.py [-n ROUNDS] [--limit N] [--min-count C] [FIXTURE_DIR]
+
+The bundled fixtures are sample responses in the Last.fm format. Real responses can be recorded
+into the fixture directory with:
+
+    python benchmarks/lastfmplus/bench_parsers.py --record API_KEY NAME ARTIST [TRACK]
+
+Picard's own XML parser is included when Picard is importable.
+"""
+
+import argparse
+import os
+import sys
+import timeit
+import xml.etree.ElementTree as ElementTree
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, os.pardir, os.pardir, "plugins", "lastfmplus_sonemicwl"))
+
+from parsers import LastfmError, parse_toptags_json, parse_toptags_node, parse_toptags_xml_stream  # noqa: E402
+
+try:
+    from picard.util.xml import parse_xml
+except ImportError:
+    parse_xml = None
+
+LASTFM_URL = "http://ws.audioscrobbler.com/2.0/"
+
+
+def etree_parser(data, limit=None, min_count=None):
+    root = ElementTree.fromstring(data)
+    return {tag.findtext("name").strip(): int(tag.findtext("count")) for tag in root.iter("tag")}
+
+
+def picard_parser(data, limit=None, min_count=None):
+    return parse_toptags_node(parse_xml(data.decode("utf-8")))
+
+
+def parsers():
+    modes = [("xml (etree)", "xml", etree_parser)]
+    if parse_xml is not None:
+        modes.append(("xml (picard)", "xml", picard_parser))
+    modes.append(("xml (stream)", "xml", parse_toptags_xml_stream))
+    modes.append(("json", "json", parse_toptags_json))
+    return modes
+
+
+def load_fixtures(directory):
+    fixtures = {}
+    for filename in sorted(os.listdir(directory)):
+        name, ext = os.path.splitext(filename)
+        if ext in (".xml", ".json"):
+            with open(os.path.join(directory, filename), "rb") as f:
+                fixtures.setdefault(name, {})[ext[1:]] = f.read()
+    return fixtures
+
+
+def record(api_key, name, artist, track, directory):
+    queryargs = {"api_key": api_key, "artist": artist, "method": "Artist.getTopTags"}
+    if track:
+        queryargs["method"] = "Track.getTopTags"
+        queryargs["track"] = track
+    for ext, extra in (("xml", {}), ("json", {"format": "json"})):
+        with urlopen(LASTFM_URL + "?" + urlencode(dict(queryargs, **extra))) as response:
+            data = response.read()
+        path = os.path.join(directory, "%s.%s" % (name, ext))
+        with open(path, "wb") as f:
+            f.write(data)
+        print("recorded %s (%d bytes)" % (path, len(data)))
+
+
+def run(fixtures, rounds, limit, min_count):
+    modes = parsers()
+    print("%-20s %8s" % ("fixture", "bytes") + "".join("%16s" % label for label, _, _ in modes))
+    totals = dict.fromkeys([label for label, _, _ in modes], 0.0)
+    for name, data in fixtures.items():
+        row = "%-20s %8d" % (name, len(data.get("xml", b"")))
+        for label, fmt, parser in modes:
+            if fmt not in data:
+                row += "%16s" % "-"
+                continue
+
+            def parse(raw=data[fmt], parse_response=parser):
+                try:
+                    parse_response(raw, limit, min_count)
+                except LastfmError:
+                    pass
+
+            seconds = timeit.timeit(parse, number=rounds) / rounds
+            totals[label] += seconds
+            row += "%13.1f us" % (seconds * 1e6)
+        print(row)
+    print("%-29s" % "total" + "".join("%13.1f us" % (totals[label] * 1e6) for label, _, _ in modes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("fixtures", nargs="?", default=os.path.join(HERE, "fixtures"))
+    parser.add_argument("-n", "--rounds", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=None, help="stop the stream/json parsers after N tags")
+    parser.add_argument("--min-count", type=float, default=None,
+                        help="stop the stream/json parsers at the first tag counted less than C")
+    parser.add_argument("--record", nargs="+", metavar="ARG", help="API_KEY NAME ARTIST [TRACK]")
+    args = parser.parse_args()
+    if args.record:
+        if len(args.record) not in (3, 4):
+            parser.error("--record takes API_KEY NAME ARTIST [TRACK]")
+        api_key, name, artist = args.record[:3]
+        record(api_key, name, artist, args.record[3] if len(args.record) == 4 else None, args.fixtures)
+    else:
+        run(load_fixtures(args.fixtures), args.rounds, args.limit, args.min_count)
+
+
+if __name__ == "__main__":
+    main()
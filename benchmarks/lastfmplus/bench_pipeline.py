@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""Offline benchmark of the lastfmplus tagging pipeline.
+
+Replays N albums of M tracks through process_album and process_track with a stubbed album,
+tagger and webservice. Last.fm requests are answered from the response fixtures.
+
+    python benchmarks/lastfmplus/bench_pipeline.py [-a ALBUMS] [-t TRACKS] [--artists K]
+        [--editions E] [--parser xml|xml-stream|json] [--set OPTION=VALUE ...] [--no-stages]
+
+Reports tracks/sec, inclusive time per stage, and peak Python memory (tracemalloc).
+The stages are download callback, parse, translation, classification and finalize (tag
+selection and metadata writing).
+Every album and track gets its own lookup, so nothing is served from a previous run.
+Albums share K artists, so artist lookups are coalesced the way they are on compilations.
+With E editions, every E albums in a row are versions of one release, their track titles
+differing only by suffixes like "(Remastered 2011)", as in a remaster heavy catalogue.
+
+Needs Picard (and PyQt5) importable, but no running Picard instance or network.
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import zlib
+from collections import defaultdict, deque
+from functools import wraps
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, os.pardir, os.pardir, "plugins"))
+
+from picard import config as picard_config  # noqa: E402
+from picard.metadata import Metadata  # noqa: E402
+from picard.util.xml import parse_xml  # noqa: E402
+
+import lastfmplus_sonemicwl as plugin  # noqa: E402
+from lastfmplus_sonemicwl import tagfilter  # noqa: E402
+
+ARTIST_FIXTURES = ("artist_large", "artist_medium", "artist_small")
+TRACK_FIXTURES = ("track_large", "track_medium", "track_medium", "track_small", "track_small", "track_not_found")
+
+
+class Signal(object):
+
+    def __init__(self):
+        self.slots = []
+
+    def connect(self, slot):
+        self.slots.append(slot)
+
+    def emit(self, *args):
+        for slot in self.slots:
+            slot(*args)
+
+
+class Config(object):
+
+    def __init__(self, setting):
+        self.setting = setting
+
+
+class FixtureWebService(object):
+    """Stands in for tagger.webservice, answering Last.fm requests from the fixtures.
+
+    Replies are queued and delivered by run_pending(), so requests made while an album loads are
+    still in flight together, as they are in Picard.
+    """
+
+    def __init__(self, fixtures):
+        self.fixtures = fixtures
+        self.queue = deque()
+        self.requests = 0
+
+    def _fixture(self, queryargs):
+        key = "\t".join([queryargs["artist"], queryargs.get("track", "")]).encode("utf-8")
+        choices = TRACK_FIXTURES if "track" in queryargs else ARTIST_FIXTURES
+        return choices[zlib.crc32(key) % len(choices)]
+
+    def get(self, host, port, path, handler, parse_response_type=None, queryargs=None, priority=False,
+            important=False):
+        self.requests += 1
+        name = self._fixture(queryargs)
+        if queryargs.get("format") == "json":
+            data = self.fixtures[name]["json"]
+        elif parse_response_type == "xml":
+            data = parse_xml(self.fixtures[name]["xml"].decode("utf-8"))
+        else:
+            data = self.fixtures[name]["xml"]
+        self.queue.append((handler, data))
+
+    def run_pending(self):
+        while self.queue:
+            handler, data = self.queue.popleft()
+            handler(data, None, None)
+
+
+class Tagger(object):
+
+    def __init__(self, setting, webservice):
+        self.config = Config(setting)
+        self.webservice = webservice
+        self.log = plugin.log
+        self.album_removed = Signal()
+
+
+class Album(object):
+
+    def __init__(self, album_id, tagger):
+        self.id = album_id
+        self.tagger = tagger
+        self._requests = 0
+        self.loaded = False
+
+    def _finalize_loading(self, error):
+        if not self._requests:
+            self.loaded = True
+
+
+class StageTimer(object):
+    """Accumulates call counts and inclusive wall time of wrapped functions"""
+
+    def __init__(self):
+        self.calls = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self._restore = []
+
+    def wrap(self, owner, attr, stage):
+        func = getattr(owner, attr)
+
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.seconds[stage] += time.perf_counter() - start
+                self.calls[stage] += 1
+
+        setattr(owner, attr, timed)
+        self._restore.append((owner, attr, func))
+
+    def restore(self):
+        while self._restore:
+            owner, attr, func = self._restore.pop()
+            setattr(owner, attr, func)
+
+
+def load_fixtures(directory):
+    fixtures = {}
+    for filename in os.listdir(directory):
+        name, ext = os.path.splitext(filename)
+        if ext in (".xml", ".json"):
+            with open(os.path.join(directory, filename), "rb") as f:
+                fixtures.setdefault(name, {})[ext[1:]] = f.read()
+    return fixtures
+
+
+def default_settings():
+    setting = {option.name: option.default for option in plugin.LastfmOptionsPage.options}
+    setting.update({
+        "lastfm_persistent_cache": False,
+        # Replies are delivered without an event loop, nothing would fire the timers pacing requests
+        "lastfm_adaptive_rate": False,
+        "write_id3v23": False,
+        "standardize_artists": False,
+        "standardize_tracks": False,
+        "translate_artist_names": False,
+    })
+    return setting
+
+
+def parse_setting(setting, assignment):
+    name, _, value = assignment.partition("=")
+    if name not in setting:
+        raise argparse.ArgumentTypeError("unknown option %r" % name)
+    default = setting[name]
+    if isinstance(default, bool):
+        value = value.lower() in ("1", "true", "yes", "on")
+    elif isinstance(default, int):
+        value = int(value)
+    setting[name] = value
+
+
+EDITION_SUFFIXES = ("", " (Remastered 2011)", " (Live)", " [2009 Remaster]", " (Mono)", " - Radio Edit")
+
+
+def make_release(album_index, tracks, artist, editions=1):
+    credit = [{"name": artist, "artist": {"name": artist}, "joinphrase": ""}]
+    original = album_index // editions
+    suffix = EDITION_SUFFIXES[album_index % editions % len(EDITION_SUFFIXES)]
+    return {
+        "id": "album-%d" % album_index,
+        "artist-credit": credit,
+        "media": [{"tracks": [{"title": "Track %d of album %d%s" % (number, original, suffix),
+                               "artist-credit": credit}
+                              for number in range(1, tracks + 1)]}],
+    }
+
+
+def reset_plugin():
+    plugin.GENRE_FILTER["_loaded_"] = False
+    plugin._filters = None
+    plugin._cache.close()
+    plugin._cache.clear()
+    plugin._inflight.clear()
+    plugin._pending_requests.clear()
+    plugin._stats.reset()
+    for data in plugin.ALBUM_ACCUMULATORS.values():
+        data.clear()
+    plugin._album_removal_connected = False
+
+
+def run(args):
+    setting = default_settings()
+    if args.parser:
+        setting["lastfm_response_parser"] = args.parser
+    for assignment in args.set:
+        parse_setting(setting, assignment)
+    webservice = FixtureWebService(load_fixtures(args.fixtures))
+    tagger = Tagger(setting, webservice)
+    # Picard's own helpers (artist credits) read the global config
+    picard_config.config = tagger.config
+    reset_plugin()
+
+    timer = StageTimer()
+    if not args.no_stages:
+        timer.wrap(plugin, "_tags_downloaded", "download callback")
+        timer.wrap(plugin, "_parse_tags", "parse")
+        timer.wrap(plugin, "apply_translations_and_sally", "translation")
+        timer.wrap(tagfilter.TagClassifier, "classify_id", "classification")
+        timer.wrap(plugin, "_select_tags", "finalize (select)")
+        timer.wrap(plugin, "_write_tags", "finalize (write)")
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    tracks = 0
+    unfinished = 0
+    try:
+        for album_index in range(args.albums):
+            album = Album("album-%d" % album_index, tagger)
+            artist = "Artist %d" % (album_index // args.editions % args.artists)
+            release = make_release(album_index, args.tracks, artist, args.editions)
+            plugin.process_album(album, Metadata(), release)
+            for track in release["media"][0]["tracks"]:
+                metadata = Metadata()
+                metadata["artist"] = artist
+                metadata["title"] = track["title"]
+                plugin.process_track(album, metadata, release, track)
+                tracks += 1
+            webservice.run_pending()
+            # noinspection PyProtectedMember
+            if album._requests:
+                unfinished += 1
+            tagger.album_removed.emit(album)
+    finally:
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        timer.restore()
+
+    print("albums %d, tracks %d, requests %d, parser %s, array scoring %s"
+          % (args.albums, tracks, webservice.requests, setting["lastfm_response_parser"],
+             setting["lastfm_array_scoring"]))
+    if unfinished:
+        print("warning: %d albums still had requests pending after all replies were delivered" % unfinished)
+    print("%.3f s, %.1f tracks/s, peak memory %.1f KiB" % (elapsed, tracks / elapsed, peak / 1024.0))
+    if timer.calls:
+        print("%-20s %8s %12s %12s" % ("stage (inclusive)", "calls", "total ms", "us/call"))
+        for stage in ("download callback", "parse", "translation", "classification", "finalize (select)",
+                      "finalize (write)"):
+            calls = timer.calls[stage]
+            seconds = timer.seconds[stage]
+            print("%-20s %8d %12.2f %12.2f" % (stage, calls, seconds * 1e3, seconds * 1e6 / calls if calls else 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("fixtures", nargs="?", default=os.path.join(HERE, "fixtures"))
+    parser.add_argument("-a", "--albums", type=int, default=200)
+    parser.add_argument("-t", "--tracks", type=int, default=12, help="tracks per album")
+    parser.add_argument("--artists", type=int, default=50, help="number of distinct album artists")
+    parser.add_argument("--editions", type=int, default=1, help="consecutive albums being versions of one release")
+    parser.add_argument("--parser", choices=("xml", "xml-stream", "json"), help="lastfm_response_parser")
+    parser.add_argument("--set", action="append", default=[], metavar="OPTION=VALUE",
+                        help="override a plugin setting, e.g. lastfm_array_scoring=true")
+    parser.add_argument("--no-stages", action="store_true",
+                        help="don't wrap the stages with timers, for throughput without their overhead")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
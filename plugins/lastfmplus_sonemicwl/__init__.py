@@ -1,16 +1,31 @@
 # -*- coding: utf-8 -*-
 
-import re
+import os
 import traceback
+from collections import deque
 from functools import partial
 
-from PyQt5 import QtCore
+from PyQt5 import QtCore, QtNetwork, QtWidgets
+from picard import log
 from picard.config import BoolOption, IntOption, TextOption
-from picard.metadata import register_track_metadata_processor
+from picard.mbjson import artist_credit_from_node
+from picard.metadata import register_album_metadata_processor, register_track_metadata_processor
 from picard.ui.options import register_options_page, OptionsPage
+from picard.util import thread
 from picard.webservice import ratecontrol
 
+from .inflight import InflightRegistry, gather, resolved
+from .normalise import DEFAULT_TITLE_SUFFIXES, TitleNormaliser
+from .parsers import LastfmError, parse_toptags_node, parse_toptags_raw
+from .ratelimit import TokenBucket, backoff_delay
+from .scoring import score_tags
+from .snapshot import SnapshotError, load_snapshot, save_snapshot
+from .stats import PipelineStats, format_stats
+from .tagcache import DAY, LRUDict, TagCache, make_cachetag
+from .tagfilter import FILTER_GROUPS, find_conflicts, split_terms
+from .filterset import FilterSet
 from .ui_options_lastfmplus import UiLastfmOptionsPage
+from .vocab import VOCABULARY
 
 PLUGIN_NAME = 'Last.fm.Plus (with Sonemic genre whitelisting)'
 PLUGIN_AUTHOR = 'RifRaf, Lukáš Lalinský, voiceinsideyou, Jaakko Perttilä, snobdiggy'
@@ -29,22 +44,76 @@ LASTFM_PATH = "/2.0/"
 # 4.4 (...) You will not make more than 5 requests per originating IP address per second, averaged over a
 # 5 minute period, without prior written consent. (...)
 ratecontrol.set_minimum_delay((LASTFM_HOST, LASTFM_PORT), 300)
+LASTFM_RATE = 5.0
+LASTFM_RATE_WINDOW = 300
+# Last.fm API error "Rate limit exceeded"
+LASTFM_ERROR_RATE_LIMIT = 29
+# Last.fm API errors worth retrying: operation failed, service offline, temporary error, rate limit exceeded
+LASTFM_TRANSIENT_ERRORS = (8, 11, 16, 29)
+# Last.fm API error for an unknown artist or track ("Invalid parameters")
+LASTFM_ERROR_NOT_FOUND = 6
+# Attempts made for a lookup failing transiently, and the back-off between them in seconds
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 2.0
+RETRY_MAX_DELAY = 30.0
+
+# With the adaptive rate control, requests are paced by this token bucket (see _request_tags) and Picard only
+# keeps a short delay between two requests, so a release can be looked up in one burst. The refill rate is
+# lowered by the burst size spread over the ToS period, so any 5 minutes stay within the average.
+RATE_MINIMUM_DELAY = 50
+_rate = TokenBucket(LASTFM_RATE, 20)
+# Requests waiting for a token, sent in order by a single timer (see _send_pending_requests)
+_pending_requests = deque()
+_send_timer = None
+
+
+def _cache_failed(error):
+    log.error("%s: tag cache database unavailable, using in-memory cache only: %s", PLUGIN_NAME, error)
+
+
+# Cache for Tags to avoid re-requesting tags, kept on disk across Picard sessions. In memory responses are
+# held as {tag id: count}, on disk by tag name.
+_cache = TagCache(on_error=_cache_failed, encode=VOCABULARY.encode, decode=VOCABULARY.decode)
+# Futures of the requests for tags made to webservice API but not yet returned, shared by every track waiting
+# on the same lookup (to avoid re-requesting the same URIs)
+_inflight = InflightRegistry()
+# Timings and counts of the lookup stages, summarised in the debug log every STATS_LOG_INTERVAL seconds while
+# lookups are in flight, and shown on the options page
+_stats = PipelineStats()
+STATS_LOG_INTERVAL = 60
+_stats_timer = None
+
+# Cache to Find the Genres and other Tags, keyed by album id. Entries are dropped when the album is removed
+# and the number of albums held is bounded, so long tagging sessions don't grow them without limit.
+ALBUM_CACHE_SIZE = 200
+ALBUM_GENRE = LRUDict(ALBUM_CACHE_SIZE)
+ALBUM_SUBGENRE = LRUDict(ALBUM_CACHE_SIZE)
+ALBUM_COUNTRY = LRUDict(ALBUM_CACHE_SIZE)
+ALBUM_CITY = LRUDict(ALBUM_CACHE_SIZE)
+ALBUM_DECADE = LRUDict(ALBUM_CACHE_SIZE)
+ALBUM_YEAR = LRUDict(ALBUM_CACHE_SIZE)
+ALBUM_OCCASION = LRUDict(ALBUM_CACHE_SIZE)
+ALBUM_CATEGORY = LRUDict(ALBUM_CACHE_SIZE)
+ALBUM_MOOD = LRUDict(ALBUM_CACHE_SIZE)
+ALBUM_ACCUMULATORS = {
+    "genre": ALBUM_GENRE,
+    "subgenre": ALBUM_SUBGENRE,
+    "country": ALBUM_COUNTRY,
+    "city": ALBUM_CITY,
+    "decade": ALBUM_DECADE,
+    "year": ALBUM_YEAR,
+    "occasion": ALBUM_OCCASION,
+    "category": ALBUM_CATEGORY,
+    "mood": ALBUM_MOOD,
+}
+# Lookups and selected tags of the releases tagged in album consensus mode, keyed by album id
+ALBUM_CONSENSUS = LRUDict(ALBUM_CACHE_SIZE)
+_album_removal_connected = False
 
-# Cache for Tags to avoid re-requesting tags within same Picard session
-_cache = {}
-# Keeps track of requests for tags made to webservice API but not yet returned (to avoid re-requesting the same URIs)
-_pending_xmlws_requests = {}
-
-# Cache to Find the Genres and other Tags
-ALBUM_GENRE = {}
-ALBUM_SUBGENRE = {}
-ALBUM_COUNTRY = {}
-ALBUM_CITY = {}
-ALBUM_DECADE = {}
-ALBUM_YEAR = {}
-ALBUM_OCCASION = {}
-ALBUM_CATEGORY = {}
-ALBUM_MOOD = {}
+# Filter lists and translations compiled from the options, see _lazy_load_filters
+_filters = None
+# Normaliser of the track titles looked up, see _title_normaliser
+_normaliser = None
 
 # noinspection PyDictCreation
 GENRE_FILTER = {}
@@ -352,56 +421,12 @@ GENRE_FILTER["category"] = ["animal songs, attitude, autumn, b-side, ballad, ban
                             "full sentence, top 40, traditional, trumpet, unique, unplugged, violin, virtuoso, "
                             "vocalization, vocals"]
 GENRE_FILTER["translate"] = {
-    "16 bit": "16-bit",
-    "16bit": "16-bit",
-    "2 step": "2-step",
-    "2step": "2-step",
-    "abstract hip hop": "abstract hip-hop",
-    "abstract hiphop": "abstract hip-hop",
     "afoxe": "afoxé",
-    "afro cuban jazz": "afro-cuban jazz",
-    "afro funk": "afro-funk",
-    "afro house": "afro-house",
-    "afro jazz": "afro-jazz",
-    "afro rock": "afro-rock",
-    "afrocuban jazz": "afro-cuban jazz",
-    "afrofunk": "afro-funk",
-    "afrohouse": "afro-house",
-    "afrojazz": "afro-jazz",
-    "afrorock": "afro-rock",
-    "al maqam al iraqi": "al-maqam al-iraqi",
-    "almaqam aliraqi": "al-maqam al-iraqi",
-    "alt country": "alt-country",
-    "altcountry": "alt-country",
     "alternative country": "alt-country",
-    "alternative r&b": "alternative r&b",
-    "anarcho punk": "anarcho-punk",
-    "anarchopunk": "anarcho-punk",
-    "anti folk": "anti-folk",
-    "antifolk": "anti-folk",
-    "avant folk": "avant-folk",
-    "avant garde jazz": "avant-garde jazz",
-    "avant garde metal": "avant-garde metal",
-    "avant prog": "avant-prog",
-    "avantfolk": "avant-folk",
-    "avantgarde jazz": "avant-garde jazz",
-    "avantgarde metal": "avant-garde metal",
-    "avantprog": "avant-prog",
     "axe": "axé",
     "baiao": "baião",
-    "balkan pop folk": "balkan pop-folk",
-    "balkan popfolk": "balkan pop-folk",
     "bandas de viento de mexico": "bandas de viento de méxico",
-    "bend skin": "bend-skin",
-    "bendskin": "bend-skin",
-    "blue eyed soul": "blue-eyed soul",
-    "blueeyed soul": "blue-eyed soul",
     "bolero espanol": "bolero español",
-    "bro country": "bro-country",
-    "brocountry": "bro-country",
-    "c pop": "c-pop",
-    "cabo zouk": "cabo-zouk",
-    "cabozouk": "cabo-zouk",
     "calgija": "čalgija",
     "cancion melodica": "canción melódica",
     "candomble music": "candomblé music",
@@ -412,103 +437,24 @@ GENRE_FILTER["translate"] = {
     "chanson a texte": "chanson à texte",
     "chanson realiste": "chanson réaliste",
     "chotis madrileno": "chotis madrileño",
-    "christian hip hop": "christian hip-hop",
-    "christian hiphop": "christian hip-hop",
-    "conscious hip hop": "conscious hip-hop",
-    "conscious hiphop": "conscious hip-hop",
-    "contemporary r&b": "contemporary r&b",
     "coupe-decale": "coupé-décalé",
-    "coupé décalé": "coupé-décalé",
-    "coupédécalé": "coupé-décalé",
-    "cpop": "c-pop",
     "cuple": "cuplé",
-    "d beat": "d-beat",
-    "dance pop": "dance-pop",
-    "dance punk": "dance-punk",
-    "dancepop": "dance-pop",
-    "dancepunk": "dance-punk",
-    "dang ak": "dang-ak",
-    "dangak": "dang-ak",
     "danzon": "danzón",
-    "dbeat": "d-beat",
-    "doo wop": "doo-wop",
-    "doowop": "doo-wop",
-    "drum 'n' bass": "drum and bass",
     "drum n bass": "drum and bass",
-    "east coast hip hop": "east coast hip-hop",
-    "east coast hiphop": "east coast hip-hop",
-    "electro disco": "electro-disco",
-    "electro industrial": "electro-industrial",
-    "electrodisco": "electro-disco",
-    "electroindustrial": "electro-industrial",
-    "emo pop": "emo-pop",
-    "emopop": "emo-pop",
-    "ethio jazz": "ethio-jazz",
-    "ethiojazz": "ethio-jazz",
-    "euro disco": "euro-disco",
-    "euro trance": "euro-trance",
-    "eurodisco": "euro-disco",
-    "eurotrance": "euro-trance",
-    "experimental hip hop": "experimental hip-hop",
-    "experimental hiphop": "experimental hip-hop",
     "forro": "forró",
     "forro eletronico": "forró eletrônico",
     "forro universitario": "forró universitário",
-    "french canadian folk music": "french-canadian folk music",
-    "french hip hop": "french hip-hop",
-    "french hiphop": "french hip-hop",
-    "frenchcanadian folk music": "french-canadian folk music",
-    "full on psytrance": "full-on psytrance",
-    "fullon psytrance": "full-on psytrance",
     "funana": "funaná",
     "funk ostentacao": "funk ostentação",
-    "g funk": "g-funk",
-    "gfunk": "g-funk",
     "ghana": "għana",
-    "go go": "go-go",
-    "gogo": "go-go",
     "guaguanco": "guaguancó",
-    "hardcore hip hop": "hardcore hip-hop",
-    "hardcore hiphop": "hardcore hip-hop",
-    "hi nrg": "hi-nrg",
-    "hinrg": "hi-nrg",
-    "hyang ak": "hyang-ak",
-    "hyangak": "hyang-ak",
-    "industrial hip hop": "industrial hip-hop",
-    "industrial hiphop": "industrial hip-hop",
-    "instrumental hip hop": "instrumental hip-hop",
-    "instrumental hiphop": "instrumental hip-hop",
-    "italo disco": "italo-disco",
-    "italodisco": "italo-disco",
-    "j core": "j-core",
-    "j pop": "j-pop",
-    "japanese hip hop": "japanese hip-hop",
-    "japanese hiphop": "japanese hip-hop",
     "japanese pop": "j-pop",
-    "jazz funk": "jazz-funk",
-    "jazz rock": "jazz-rock",
-    "jazzfunk": "jazz-funk",
-    "jazzrock": "jazz-rock",
-    "jcore": "j-core",
-    "jeong ak": "jeong-ak",
-    "jeongak": "jeong-ak",
     "joruri": "jōruri",
-    "jpop": "j-pop",
     "juju": "jùjú",
-    "jump blues": "jump-blues",
-    "jump up": "jump-up",
-    "jumpblues": "jump-blues",
-    "jumpup": "jump-up",
-    "k pop": "k-pop",
     "kayokyoku": "kayōkyoku",
     "konsrock": "könsrock",
     "korean pop": "k-pop",
-    "kpop": "k-pop",
     "lautareasca": "lăutărească",
-    "lo fi indie": "lo-fi indie",
-    "lofi indie": "lo-fi indie",
-    "mbenga mbuti music": "mbenga-mbuti music",
-    "mbengambuti music": "mbenga-mbuti music",
     "merecumbe": "merecumbé",
     "meringue": "méringue",
     "min'yo": "min'yō",
@@ -518,241 +464,206 @@ GENRE_FILTER["translate"] = {
     "musica gaucha": "música gaúcha",
     "musique concrete": "musique concrète",
     "muzica de mahala": "muzică de mahala",
-    "neo medieval folk": "neo-medieval folk",
-    "neo prog": "neo-prog",
-    "neo psychedelia": "neo-psychedelia",
-    "neo soul": "neo-soul",
-    "neo traditionalist country": "neo-traditionalist country",
-    "neomedieval folk": "neo-medieval folk",
-    "neoprog": "neo-prog",
-    "neopsychedelia": "neo-psychedelia",
-    "neosoul": "neo-soul",
-    "neotraditionalist country": "neo-traditionalist country",
     "neue deutsche harte": "neue deutsche härte",
-    "new orleans r&b": "new orleans r&b",
     "nhac vang": "nhạc vàng",
     "norteno": "norteño",
     "nouvelle chanson francaise": "nouvelle chanson française",
     "nova canco": "nova cançó",
     "nova cancon": "nòva cançon",
-    "nu disco": "nu-disco",
-    "nudisco": "nu-disco",
     "nueva cancion": "nueva canción",
     "nueva cancion espanola": "nueva canción española",
     "nueva cancion latinoamericana": "nueva canción latinoamericana",
-    "old time": "old-time",
-    "oldtime": "old-time",
     "ondo": "ondō",
     "ozgun muzik": "özgün müzik",
-    "p funk": "p-funk",
     "pagode romantico": "pagode romântico",
-    "pfunk": "p-funk",
     "pilon": "pilón",
     "poezja spiewana": "poezja śpiewana",
-    "political hip hop": "political hip-hop",
-    "political hiphop": "political hip-hop",
     "pop rai": "pop raï",
-    "post bop": "post-bop",
-    "post grunge": "post-grunge",
-    "post hardcore": "post-hardcore",
-    "post industrial": "post-industrial",
-    "post minimalism": "post-minimalism",
-    "post punk": "post-punk",
-    "post punk revival": "post-punk revival",
-    "post rock": "post-rock",
-    "postbop": "post-bop",
-    "postgrunge": "post-grunge",
-    "posthardcore": "post-hardcore",
-    "postindustrial": "post-industrial",
-    "postminimalism": "post-minimalism",
-    "postpunk": "post-punk",
-    "postpunk revival": "post-punk revival",
-    "postrock": "post-rock",
-    "proto punk": "proto-punk",
-    "protopunk": "proto-punk",
     "rai": "raï",
     "rapai daboih": "rapai dabõih",
     "rock urbano espanol": "rock urbano español",
     "rokyoku": "rōkyoku",
-    "romanian dance pop": "romanian dance-pop",
-    "romanian dancepop": "romanian dance-pop",
     "romante": "romanţe",
     "ryukoka": "ryūkōka",
     "salsa romantica": "salsa romántica",
-    "samba canção": "samba-canção",
-    "samba choro": "samba-choro",
-    "samba enredo": "samba-enredo",
-    "samba exaltação": "samba-exaltação",
-    "samba jazz": "samba-jazz",
-    "samba reggae": "samba-reggae",
-    "samba rock": "samba-rock",
     "samba-cancao": "samba-canção",
     "samba-exaltacao": "samba-exaltação",
-    "sambacanção": "samba-canção",
-    "sambachoro": "samba-choro",
-    "sambaenredo": "samba-enredo",
-    "sambaexaltação": "samba-exaltação",
-    "sambajazz": "samba-jazz",
-    "sambareggae": "samba-reggae",
-    "sambarock": "samba-rock",
     "sante engage": "santé engagé",
     "santeria music": "santería music",
-    "sean nós": "sean-nós",
     "sean-nos": "sean-nós",
-    "seannós": "sean-nós",
     "sertanejo romantico": "sertanejo romântico",
     "sertanejo universitario": "sertanejo universitário",
     "sha`abi": "shaʻabi",
-    "shibuya kei": "shibuya-kei",
-    "shibuyakei": "shibuya-kei",
-    "slack key guitar": "slack-key guitar",
-    "slackkey guitar": "slack-key guitar",
     "son istmeno": "son istmeño",
-    "sophisti pop": "sophisti-pop",
-    "sophistipop": "sophisti-pop",
-    "sotho tswana folk music": "sotho-tswana folk music",
-    "sothotswana folk music": "sotho-tswana folk music",
-    "southern hip hop": "southern hip-hop",
-    "southern hiphop": "southern hip-hop",
-    "stand up comedy": "stand-up comedy",
-    "standup comedy": "stand-up comedy",
     "sutartines": "sutartinės",
     "tchinkoume": "tchinkoumé",
     "te puoro maori": "te pūoro māori",
     "techno kayo": "techno kayō",
-    "tex mex": "tex-mex",
-    "texmex": "tex-mex",
-    "tradi modern": "tradi-modern",
-    "tradimodern": "tradi-modern",
     "traditional rai": "traditional raï",
     "traditional sega": "traditional séga",
     "tragedie en musique": "tragédie en musique",
     "tras-os-montes folk music": "trás-os-montes folk music",
     "tropicalia": "tropicália",
-    "trás os montes folk music": "trás-os-montes folk music",
-    "trásosmontes folk music": "trás-os-montes folk music",
     "tumbele": "tumbélé",
-    "turbo folk": "turbo-folk",
-    "turbofolk": "turbo-folk",
-    "turkic mongolic traditional music": "turkic-mongolic traditional music",
-    "turkicmongolic traditional music": "turkic-mongolic traditional music",
-    "uk hip hop": "uk hip-hop",
-    "uk hiphop": "uk hip-hop",
     "venezuelan malaguena": "venezuelan malagueña",
     "volkstumliche musik": "volkstümliche musik",
-    "west coast hip hop": "west coast hip-hop",
-    "west coast hiphop": "west coast hip-hop",
     "ye-ye": "yé-yé",
-    "yé yé": "yé-yé",
-    "yéyé": "yé-yé"
 }
 
 
-def matches_list(s, lst):
-    if s in lst:
-        return True
-    for item in lst:
-        if '*' in item:
-            if re.match(re.escape(item).replace(r'\*', '.*?'), s):
-                return True
-    return False
+# Function to sort/compare a 2 Element of Tupel
 
 
-# Function to sort/compare a 2 Element of Tupel
+def cmptaginfokey(a):
+    return a[1][0]
 
 
-def cmptaginfo(a, b):
-    return (a[1][0] > b[1][0]) - (a[1][0] < b[1][0]) * -1
+def accumulator_counts():
+    """Returns the number of albums currently held by each album accumulator"""
+    return {name: len(data) for name, data in ALBUM_ACCUMULATORS.items()}
 
 
-def cmptaginfokey(a):
-    return a[1][0]
+def _release_album(album):
+    for data in ALBUM_ACCUMULATORS.values():
+        data.pop(album.id, None)
+    ALBUM_CONSENSUS.pop(album.id, None)
+
+
+def _watch_album_removal(tagger):
+    global _album_removal_connected
+    if not _album_removal_connected:
+        tagger.album_removed.connect(_release_album)
+        _album_removal_connected = True
 
 
 def _lazy_load_filters(cfg):
+    """Returns the current FilterSet, reloading what changed if the options were saved since the last load"""
+    global _filters
     if not GENRE_FILTER["_loaded_"]:
-        GENRE_FILTER["major"] = cfg["lastfm_genre_major"].split(',')
-        GENRE_FILTER["minor"] = cfg["lastfm_genre_minor"].split(',')
-        GENRE_FILTER["decade"] = cfg["lastfm_genre_decade"].split(',')
-        GENRE_FILTER["year"] = cfg["lastfm_genre_year"].split(',')
-        GENRE_FILTER["country"] = cfg["lastfm_genre_country"].split(',')
-        GENRE_FILTER["city"] = cfg["lastfm_genre_city"].split(',')
-        GENRE_FILTER["mood"] = cfg["lastfm_genre_mood"].split(',')
-        GENRE_FILTER["occasion"] = cfg["lastfm_genre_occasion"].split(',')
-        GENRE_FILTER["category"] = cfg["lastfm_genre_category"].split(',')
-        GENRE_FILTER["translate"] = dict([item.split(',') for item in cfg["lastfm_genre_translations"].split("\n")])
+        # Only the lists whose option text changed are parsed and compiled again. The new set replaces the
+        # old one in a single assignment once it is complete; finalizations keep the set they started with.
+        filters = None
+        if cfg["lastfm_filter_snapshot"]:
+            filters = _load_snapshot_filters(cfg["lastfm_filter_snapshot"])
+        if filters is None:
+            filters = FilterSet.build(cfg, _filters, VOCABULARY.name)
+        if filters is not _filters:
+            log.debug("%s: reloaded genre filters: %s", PLUGIN_NAME, ", ".join(filters.changed_options(_filters)))
+            _filters = filters
+        _cache.configure(cfg["lastfm_cache_ttl_days"] * DAY, cfg["lastfm_cache_max_entries"])
+        burst = cfg["lastfm_rate_burst"]
+        _rate.configure(LASTFM_RATE - float(burst) / LASTFM_RATE_WINDOW, burst)
+        ratecontrol.set_minimum_delay((LASTFM_HOST, LASTFM_PORT),
+                                      RATE_MINIMUM_DELAY if cfg["lastfm_adaptive_rate"] else 300)
+        if cfg["lastfm_persistent_cache"] and not _cache.persistent:
+            _cache.open(_cache_path())
+        elif not cfg["lastfm_persistent_cache"]:
+            _cache.close()
         GENRE_FILTER["_loaded_"] = True
+    return _filters
+
+
+def _load_snapshot_filters(path):
+    """Returns the filter set of a snapshot file, or None if it cannot be loaded"""
+    try:
+        filters = load_snapshot(path)
+    except (OSError, SnapshotError) as e:
+        log.error("%s: cannot load filter snapshot, using the lists from the options: %s", PLUGIN_NAME, e)
+        return None
+    if _filters is not None and filters.sources == _filters.sources:
+        # Same lists as loaded already, keep the warm memos
+        return _filters
+    return filters
 
 
-def apply_translations_and_sally(tag_to_count, sally, factor):
+def _cache_path():
+    return os.path.join(QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.CacheLocation),
+                        "lastfmplus", "tags.sqlite")
+
+
+def apply_translations_and_sally(filters, tag_to_count, sally, factor):
     ret = {}
-    for name, count in tag_to_count.items():
+    translated = filters.translated
+    for tag_id, count in tag_to_count.items():
         # apply translations
         try:
-            name = GENRE_FILTER["translate"][name.lower()]
+            target = translated[tag_id]
         except KeyError:
-            pass
-
-        # make sure it's lowercase
-        lower = name.lower()
+            name = VOCABULARY.name(tag_id)
+            target = translated[tag_id] = VOCABULARY.intern(filters.translate.translate(name))
+        tag_id = target
 
-        if lower not in ret or ret[lower][0] < (count * factor):
-            ret[lower] = [count * factor, sally]
+        if tag_id not in ret or ret[tag_id][0] < (count * factor):
+            ret[tag_id] = [count * factor, sally]
     return list(ret.items())
 
 
-def _tags_finalize(album, metadata, tags, get_next):
-    """Processes the tag metadata to decide which tags to use and sets metadata"""
-
-    if get_next:
-        get_next(tags)
+def _select_tags(album, tags, filters):
+    """Decides which tags to use per filter group; returns the "<group>/tags" lists"""
+
+    cfg = album.tagger.config.setting
+
+    # last tag-weight for inter-tag comparsion
+    lastw = {"n": False, "s": False}
+    # List: (use sally-tags, use track-tags, use artist-tags, use
+    # drop-info,use minweight, max_elems
+    info = {"major": [True, True, True, True, True, cfg["lastfm_max_group_tags"]],
+            "minor": [True, True, True, True, True, cfg["lastfm_max_minor_tags"]],
+            "country": [True, False, True, False, False, 1],
+            "city": [True, False, True, False, False, 1],
+            "decade": [True, True, False, False, False, 1],
+            "year": [True, True, False, False, False, 1],
+            "year2": [True, True, False, False, False, 1],
+            "year3": [True, True, False, False, False, 1],
+            "mood": [True, True, True, False, False, cfg["lastfm_max_mood_tags"]],
+            "occasion": [True, True, True, False, False, cfg["lastfm_max_occasion_tags"]],
+            "category": [True, True, True, False, False, cfg["lastfm_max_category_tags"]]
+            }
+    # Tags are matched against the filter lists through the precompiled classifier; "year2" and "year3"
+    # share the year list and are never reached, as every tag is only faced by its first matching list
+    classifier = filters.classifier
+
+    def classify(tag_id):
+        return classifier.classify_id(tag_id, VOCABULARY)
+    hold = {"all/tags": []}
+
+    # Init the Album-Informations
+    albid = album.id
+    if cfg["write_id3v23"]:
+        year_tag = '~id3:TORY'
     else:
-        cfg = album.tagger.config.setting
-
-        # last tag-weight for inter-tag comparsion
-        lastw = {"n": False, "s": False}
-        # List: (use sally-tags, use track-tags, use artist-tags, use
-        # drop-info,use minweight,searchlist, max_elems
-        info = {"major": [True, True, True, True, True, GENRE_FILTER["major"], cfg["lastfm_max_group_tags"]],
-                "minor": [True, True, True, True, True, GENRE_FILTER["minor"], cfg["lastfm_max_minor_tags"]],
-                "country": [True, False, True, False, False, GENRE_FILTER["country"], 1],
-                "city": [True, False, True, False, False, GENRE_FILTER["city"], 1],
-                "decade": [True, True, False, False, False, GENRE_FILTER["decade"], 1],
-                "year": [True, True, False, False, False, GENRE_FILTER["year"], 1],
-                "year2": [True, True, False, False, False, GENRE_FILTER["year"], 1],
-                "year3": [True, True, False, False, False, GENRE_FILTER["year"], 1],
-                "mood": [True, True, True, False, False, GENRE_FILTER["mood"], cfg["lastfm_max_mood_tags"]],
-                "occasion": [True, True, True, False, False, GENRE_FILTER["occasion"],
-                             cfg["lastfm_max_occasion_tags"]],
-                "category": [True, True, True, False, False, GENRE_FILTER["category"],
-                             cfg["lastfm_max_category_tags"]]
-                }
-        hold = {"all/tags": []}
-
-        # Init the Album-Informations
-        albid = album.id
-        if cfg["write_id3v23"]:
-            year_tag = '~id3:TORY'
+        year_tag = '~id3:TDOR'
+    glb = {"major": {'metatag': 'grouping', 'data': ALBUM_GENRE},
+           "country": {'metatag': 'comment:Songs-DB_Custom3', 'data': ALBUM_COUNTRY},
+           "city": {'metatag': 'comment:Songs-DB_Custom3', 'data': ALBUM_CITY},
+           "year": {'metatag': year_tag, 'data': ALBUM_YEAR},
+           "year2": {'metatag': 'originalyear', 'data': ALBUM_YEAR},
+           "year3": {'metatag': 'date', 'data': ALBUM_YEAR}}
+    if albid not in ALBUM_GENRE:
+        _watch_album_removal(album.tagger)
+        log.debug("%s: album accumulators hold %r albums", PLUGIN_NAME, accumulator_counts())
+    for elem in list(glb.keys()):
+        if albid not in glb[elem]['data']:
+            glb[elem]['data'][albid] = {'count': 1, 'genres': {}}
+        else:
+            # noinspection PyTypeChecker
+            glb[elem]['data'][albid]['count'] += 1
+
+    if tags:
+        if cfg["lastfm_array_scoring"]:
+            def accumulate(group, name, weight):
+                # collect global genre information for special tag-filters
+                if group in glb:
+                    # noinspection PyTypeChecker
+                    genres = glb[group]['data'][albid]['genres']
+                    genres[name] = genres.get(name, 0) + weight
+
+            hold.update(score_tags(tags, classify, VOCABULARY.title, info, cfg, accumulate))
         else:
-            year_tag = '~id3:TDOR'
-        glb = {"major": {'metatag': 'grouping', 'data': ALBUM_GENRE},
-               "country": {'metatag': 'comment:Songs-DB_Custom3', 'data': ALBUM_COUNTRY},
-               "city": {'metatag': 'comment:Songs-DB_Custom3', 'data': ALBUM_CITY},
-               "year": {'metatag': year_tag, 'data': ALBUM_YEAR},
-               "year2": {'metatag': 'originalyear', 'data': ALBUM_YEAR},
-               "year3": {'metatag': 'date', 'data': ALBUM_YEAR}}
-        for elem in list(glb.keys()):
-            if albid not in glb[elem]['data']:
-                glb[elem]['data'][albid] = {'count': 1, 'genres': {}}
-            else:
-                # noinspection PyTypeChecker
-                glb[elem]['data'][albid]['count'] += 1
-
-        if tags:
             # search for tags
             tags.sort(key=cmptaginfokey, reverse=True)
-            for lowered, [weight, stype] in tags:
-                name = lowered.title()
+            for tag_id, [weight, stype] in tags:
+                name = VOCABULARY.title(tag_id)
                 # if is tag which should only used for extension (if too few
                 # tags found)
                 s = stype == 1
@@ -773,55 +684,54 @@ def _tags_finalize(album, metadata, tags, get_next):
                 below = (s and weight < cfg["lastfm_min_artisttag_weight"]) or (
                         not s and weight < cfg["lastfm_min_tracktag_weight"])
 
-                for group, ielem in list(info.items()):
-                    if matches_list(lowered, ielem[5]):
-                        if below and ielem[4]:
-                            # If Should use min-weigh information
-                            break
-                        if drop and ielem[3]:
-                            # If Should use the drop-information
-                            break
-                        if s and not ielem[0]:
-                            # If Sally-Tag and should not be used
-                            break
-                        if arttag and not ielem[2]:
-                            # If Artist-Tag and should not be used
-                            break
-                        if not arttag and not ielem[1]:
-                            # If Track-Tag and should not be used
-                            break
-
-                        # prefer Not-Sally-Tags (so, artist OR track-tags)
-                        if not s and group + "/sally" in hold and name in hold[group + "/sally"]:
-                            hold[group + "/sally"].remove(name)
-                            hold[group + "/tags"].remove(name)
-                        # Insert Tag
-                        if not group + "/tags" in hold:
-                            hold[group + "/tags"] = []
-                        if name not in hold[group + "/tags"]:
-                            if s:
-                                if not group + "/sally" in hold:
-                                    hold[group + "/sally"] = []
-                                hold[group + "/sally"].append(name)
-                            # collect global genre information for special
-                            # tag-filters
-                            if not arttag and group in glb:
-                                # noinspection PyTypeChecker
-                                if name not in glb[group]['data'][albid]['genres']:
-                                    # noinspection PyTypeChecker
-                                    glb[group]['data'][albid]['genres'][name] = weight
-                                else:
-                                    # noinspection PyTypeChecker
-                                    glb[group]['data'][albid]['genres'][name] += weight
-                            # append tag
-                            hold[group + "/tags"].append(name)
-                        # Break becase every Tag should be faced only by one
-                        # GENRE_FILTER
-                        break
+                group = classify(tag_id)
+                if group is None:
+                    continue
+                ielem = info[group]
+                if below and ielem[4]:
+                    # If Should use min-weigh information
+                    continue
+                if drop and ielem[3]:
+                    # If Should use the drop-information
+                    continue
+                if s and not ielem[0]:
+                    # If Sally-Tag and should not be used
+                    continue
+                if arttag and not ielem[2]:
+                    # If Artist-Tag and should not be used
+                    continue
+                if not arttag and not ielem[1]:
+                    # If Track-Tag and should not be used
+                    continue
+
+                # prefer Not-Sally-Tags (so, artist OR track-tags)
+                if not s and group + "/sally" in hold and name in hold[group + "/sally"]:
+                    hold[group + "/sally"].remove(name)
+                    hold[group + "/tags"].remove(name)
+                # Insert Tag
+                if not group + "/tags" in hold:
+                    hold[group + "/tags"] = []
+                if name not in hold[group + "/tags"]:
+                    if s:
+                        if not group + "/sally" in hold:
+                            hold[group + "/sally"] = []
+                        hold[group + "/sally"].append(name)
+                    # collect global genre information for special
+                    # tag-filters
+                    if not arttag and group in glb:
+                        # noinspection PyTypeChecker
+                        if name not in glb[group]['data'][albid]['genres']:
+                            # noinspection PyTypeChecker
+                            glb[group]['data'][albid]['genres'][name] = weight
+                        else:
+                            # noinspection PyTypeChecker
+                            glb[group]['data'][albid]['genres'][name] += weight
+                    # append tag
+                    hold[group + "/tags"].append(name)
 
             # cut to wanted size
             for group, ielem in list(info.items()):
-                while group + "/tags" in hold and len(hold[group + "/tags"]) > ielem[6]:
+                while group + "/tags" in hold and len(hold[group + "/tags"]) > ielem[5]:
                     # Remove first all Sally-Tags
                     if group + "/sally" in hold and len(hold[group + "/sally"]) > 0:
                         deltag = hold[group + "/sally"].pop()
@@ -829,225 +739,572 @@ def _tags_finalize(album, metadata, tags, get_next):
                     else:
                         hold[group + "/tags"].pop()
 
-            # join the information
-            join_tags = cfg["lastfm_join_tags_sign"]
-
-            def join_tags_or_not(lst):
-                if join_tags:
-                    return join_tags.join(lst)
-                return lst
-
-            if 1:
-                used = []
-
-                # write the major-tags
-                if "major/tags" in hold and len(hold["major/tags"]) > 0:
-                    metadata["grouping"] = join_tags_or_not(hold["major/tags"])
-                    used.extend(hold["major/tags"])
-
-                # write the decade-tags
-                if "decade/tags" in hold and len(hold["decade/tags"]) > 0 and cfg["lastfm_use_decade_tag"]:
-                    metadata["decade"] = join_tags_or_not(
-                        [item.lower() for item in hold["decade/tags"]])
-                    used.extend(hold["decade/tags"])
-
-                # write country tag
-                if "country/tags" in hold and len(hold["country/tags"]) > 0 and "city/tags" in hold and len(
-                        hold["city/tags"]) > 0 and cfg["lastfm_use_country_tag"] and cfg["lastfm_use_city_tag"]:
-                    metadata["country"] = join_tags_or_not(
-                        hold["country/tags"] + hold["city/tags"])
-                    used.extend(hold["country/tags"])
-                    used.extend(hold["city/tags"])
-                elif "country/tags" in hold and len(hold["country/tags"]) > 0 and cfg["lastfm_use_country_tag"]:
-                    metadata["country"] = join_tags_or_not(
-                        hold["country/tags"])
-                    used.extend(hold["country/tags"])
-                elif "city/tags" in hold and len(hold["city/tags"]) > 0 and cfg["lastfm_use_city_tag"]:
-                    metadata["city"] = join_tags_or_not(
-                        hold["city/tags"])
-                    used.extend(hold["city/tags"])
-
-                # write the mood-tags
-                if "mood/tags" in hold and len(hold["mood/tags"]) > 0:
-                    metadata["mood"] = join_tags_or_not(hold["mood/tags"])
-                    used.extend(hold["mood/tags"])
-
-                # write the occasion-tags
-                if "occasion/tags" in hold and len(hold["occasion/tags"]) > 0:
-                    metadata["occasion"] = join_tags_or_not(
-                        hold["occasion/tags"])
-                    used.extend(hold["occasion/tags"])
-
-                # write the category-tags
-                if "category/tags" in hold and len(hold["category/tags"]) > 0:
-                    metadata["category"] = join_tags_or_not(
-                        hold["category/tags"])
-                    used.extend(hold["category/tags"])
-
-                # include major tags as minor tags also copy major to minor if
-                # no minor genre
-                if cfg["lastfm_app_major2minor_tag"] and "major/tags" in hold and "minor/tags" in hold and len(
-                        hold["minor/tags"]) > 0:
-                    used.extend(hold["major/tags"])
-                    used.extend(hold["minor/tags"])
-                    if len(used) > 0:
-                        metadata["genre"] = join_tags_or_not(
-                            hold["major/tags"] + hold["minor/tags"])
-                elif cfg["lastfm_app_major2minor_tag"] and "major/tags" in hold and "minor/tags" not in hold:
-                    used.extend(hold["major/tags"])
-                    if len(used) > 0:
-                        metadata["genre"] = join_tags_or_not(
-                            hold["major/tags"])
-                elif "minor/tags" in hold and len(hold["minor/tags"]) > 0:
-                    metadata["genre"] = join_tags_or_not(
-                        hold["minor/tags"])
-                    used.extend(hold["minor/tags"])
+    return hold
+
+
+def _write_tags(album, metadata, hold):
+    """Sets the metadata of a track from the tags selected by _select_tags"""
+
+    cfg = album.tagger.config.setting
+
+    # join the information
+    join_tags = cfg["lastfm_join_tags_sign"]
+
+    def join_tags_or_not(lst):
+        if join_tags:
+            return join_tags.join(lst)
+        return lst
+
+    if 1:
+        used = []
+
+        # write the major-tags
+        if "major/tags" in hold and len(hold["major/tags"]) > 0:
+            metadata["grouping"] = join_tags_or_not(hold["major/tags"])
+            used.extend(hold["major/tags"])
+
+        # write the decade-tags
+        if "decade/tags" in hold and len(hold["decade/tags"]) > 0 and cfg["lastfm_use_decade_tag"]:
+            metadata["decade"] = join_tags_or_not(
+                [item.lower() for item in hold["decade/tags"]])
+            used.extend(hold["decade/tags"])
+
+        # write country tag
+        if "country/tags" in hold and len(hold["country/tags"]) > 0 and "city/tags" in hold and len(
+                hold["city/tags"]) > 0 and cfg["lastfm_use_country_tag"] and cfg["lastfm_use_city_tag"]:
+            metadata["country"] = join_tags_or_not(
+                hold["country/tags"] + hold["city/tags"])
+            used.extend(hold["country/tags"])
+            used.extend(hold["city/tags"])
+        elif "country/tags" in hold and len(hold["country/tags"]) > 0 and cfg["lastfm_use_country_tag"]:
+            metadata["country"] = join_tags_or_not(
+                hold["country/tags"])
+            used.extend(hold["country/tags"])
+        elif "city/tags" in hold and len(hold["city/tags"]) > 0 and cfg["lastfm_use_city_tag"]:
+            metadata["city"] = join_tags_or_not(
+                hold["city/tags"])
+            used.extend(hold["city/tags"])
+
+        # write the mood-tags
+        if "mood/tags" in hold and len(hold["mood/tags"]) > 0:
+            metadata["mood"] = join_tags_or_not(hold["mood/tags"])
+            used.extend(hold["mood/tags"])
+
+        # write the occasion-tags
+        if "occasion/tags" in hold and len(hold["occasion/tags"]) > 0:
+            metadata["occasion"] = join_tags_or_not(
+                hold["occasion/tags"])
+            used.extend(hold["occasion/tags"])
+
+        # write the category-tags
+        if "category/tags" in hold and len(hold["category/tags"]) > 0:
+            metadata["category"] = join_tags_or_not(
+                hold["category/tags"])
+            used.extend(hold["category/tags"])
+
+        # include major tags as minor tags also copy major to minor if
+        # no minor genre
+        if cfg["lastfm_app_major2minor_tag"] and "major/tags" in hold and "minor/tags" in hold and len(
+                hold["minor/tags"]) > 0:
+            used.extend(hold["major/tags"])
+            used.extend(hold["minor/tags"])
+            if len(used) > 0:
+                metadata["genre"] = join_tags_or_not(
+                    hold["major/tags"] + hold["minor/tags"])
+        elif cfg["lastfm_app_major2minor_tag"] and "major/tags" in hold and "minor/tags" not in hold:
+            used.extend(hold["major/tags"])
+            if len(used) > 0:
+                metadata["genre"] = join_tags_or_not(
+                    hold["major/tags"])
+        elif "minor/tags" in hold and len(hold["minor/tags"]) > 0:
+            metadata["genre"] = join_tags_or_not(
+                hold["minor/tags"])
+            used.extend(hold["minor/tags"])
+        else:
+            if "minor/tags" not in hold and "major/tags" in hold:
+                metadata["genre"] = metadata["grouping"]
+
+        # replace blank original year with release date
+        if cfg["lastfm_use_year_tag"]:
+            if "year/tags" not in hold and len(metadata["date"]) > 0:
+                metadata["originalyear"] = metadata["date"][:4]
+                if cfg["write_id3v23"]:
+                    metadata["~id3:TORY"] = metadata["date"][:4]
+                    # album.tagger.log.info('TORY: %r', metadata["~id3:TORY"])
                 else:
-                    if "minor/tags" not in hold and "major/tags" in hold:
-                        metadata["genre"] = metadata["grouping"]
-
-                # replace blank original year with release date
-                if cfg["lastfm_use_year_tag"]:
-                    if "year/tags" not in hold and len(metadata["date"]) > 0:
-                        metadata["originalyear"] = metadata["date"][:4]
-                        if cfg["write_id3v23"]:
-                            metadata["~id3:TORY"] = metadata["date"][:4]
-                            # album.tagger.log.info('TORY: %r', metadata["~id3:TORY"])
-                        else:
-                            metadata["~id3:TDOR"] = metadata["date"][:4]
-                            # album.tagger.log.info('TDOR: %r', metadata["~id3:TDOR"])
-                    if metadata["originalyear"] > metadata["date"][:4]:
-                        metadata["originalyear"] = metadata["date"][:4]
-                    if metadata["~id3:TDOR"] > metadata["date"][:4] and not cfg["write_id3v23"]:
-                        metadata["~id3:TDOR"] = metadata["date"][:4]
-                    if metadata["~id3:TORY"] > metadata["date"][:4] and cfg["write_id3v23"]:
-                        metadata["~id3:TORY"] = metadata["date"][:4]
-                # Replace blank decades
-                if "decade/tags" not in hold and len(metadata["originalyear"]) > 0 and int(
-                        metadata["originalyear"]) > 1999 and cfg["lastfm_use_decade_tag"]:
-                    metadata["comment:Songs-DB_Custom1"] = "20%s0s" % str(metadata["originalyear"])[2]
-                elif "decade/tags" not in hold and len(metadata["originalyear"]) > 0 and int(
-                        metadata["originalyear"]) < 2000 and int(metadata["originalyear"]) > 1899\
-                        and cfg["lastfm_use_decade_tag"]:
-                    metadata["comment:Songs-DB_Custom1"] = "19%s0s" % str(metadata["originalyear"])[2]
-                elif "decade/tags" not in hold and len(metadata["originalyear"]) > 0 and int(
-                        metadata["originalyear"]) < 1900 and int(metadata["originalyear"]) > 1799\
-                        and cfg["lastfm_use_decade_tag"]:
-                    metadata["comment:Songs-DB_Custom1"] = "18%s0s" % str(metadata["originalyear"])[2]
-
-
-def _tags_downloaded(album, metadata, sally, factor, get_next, current, data, reply, error):
-    q = QtCore.QUrlQuery(reply.url())
-    cachetag = q.queryItemValue('artist')
-    if q.queryItemValue('method') == "Track.getTopTags":
-        cachetag += q.queryItemValue('method')
+                    metadata["~id3:TDOR"] = metadata["date"][:4]
+                    # album.tagger.log.info('TDOR: %r', metadata["~id3:TDOR"])
+            if metadata["originalyear"] > metadata["date"][:4]:
+                metadata["originalyear"] = metadata["date"][:4]
+            if metadata["~id3:TDOR"] > metadata["date"][:4] and not cfg["write_id3v23"]:
+                metadata["~id3:TDOR"] = metadata["date"][:4]
+            if metadata["~id3:TORY"] > metadata["date"][:4] and cfg["write_id3v23"]:
+                metadata["~id3:TORY"] = metadata["date"][:4]
+        # Replace blank decades
+        if "decade/tags" not in hold and len(metadata["originalyear"]) > 0 and int(
+                metadata["originalyear"]) > 1999 and cfg["lastfm_use_decade_tag"]:
+            metadata["comment:Songs-DB_Custom1"] = "20%s0s" % str(metadata["originalyear"])[2]
+        elif "decade/tags" not in hold and len(metadata["originalyear"]) > 0 and int(
+                metadata["originalyear"]) < 2000 and int(metadata["originalyear"]) > 1899\
+                and cfg["lastfm_use_decade_tag"]:
+            metadata["comment:Songs-DB_Custom1"] = "19%s0s" % str(metadata["originalyear"])[2]
+        elif "decade/tags" not in hold and len(metadata["originalyear"]) > 0 and int(
+                metadata["originalyear"]) < 1900 and int(metadata["originalyear"]) > 1799\
+                and cfg["lastfm_use_decade_tag"]:
+            metadata["comment:Songs-DB_Custom1"] = "18%s0s" % str(metadata["originalyear"])[2]
+
+
+def statistics():
+    """Returns the statistics of the lookups made in this session, as a dict of plain data"""
+    stats = _stats.as_dict()
+    stats["in_flight"] = len(_inflight)
+    stats["request_rate"] = round(_rate.rate, 2)
+    return stats
+
+
+def _log_stats():
+    if _stats.changed():
+        log.debug("%s: %s", PLUGIN_NAME, _stats.summary())
+    if not _inflight:
+        _stats_timer.stop()
+
+
+def _start_stats_log():
+    global _stats_timer
+    if _stats_timer is None:
+        _stats_timer = QtCore.QTimer()
+        _stats_timer.setInterval(STATS_LOG_INTERVAL * 1000)
+        _stats_timer.timeout.connect(_log_stats)
+    if not _stats_timer.isActive():
+        _stats_timer.start()
+
+
+def _tags_finalize(album, metadata, tags, filters):
+    """Processes the tag metadata to decide which tags to use and sets metadata"""
+    hold = _select_tags(album, tags, filters)
+    if tags:
+        _write_tags(album, metadata, hold)
 
-    try:
-        try:
-            intags = data.lfm[0].toptags[0].tag
-        except AttributeError:
-            intags = []
 
-        # Extract just names and counts from response; apply no parsing at this stage
-        tag_to_count = {}
-        for tag in intags:
-            # name of the tag
-            name = tag.name[0].text.strip()
+def _parse_tags(data, cfg, min_count=None):
+    """Extract just names (as vocabulary ids) and counts from response; apply no parsing at this stage"""
+    if isinstance(data, (bytes, bytearray, QtCore.QByteArray)):
+        name_to_count = parse_toptags_raw(bytes(data), cfg["lastfm_max_parsed_tags"], min_count)
+    else:
+        name_to_count = parse_toptags_node(data)
+    return VOCABULARY.decode(name_to_count)
 
-            # count of the tag
-            try:
-                count = int(tag.count[0].text.strip())
-            except ValueError:
-                count = 0
 
-            tag_to_count[name] = count
+def _http_status(reply):
+    try:
+        return reply.attribute(QtNetwork.QNetworkRequest.HttpStatusCodeAttribute)
+    except AttributeError:
+        return None
+
+
+def _rate_feedback(reply, error):
+    """Lets the rate control back off when Last.fm refuses requests for exceeding the rate limit"""
+    if not error:
+        _rate.succeeded()
+    elif _http_status(reply) == 429 or (isinstance(error, LastfmError) and error.code == LASTFM_ERROR_RATE_LIMIT):
+        if _rate.throttled():
+            log.warning("%s: Last.fm rate limit exceeded, slowing down to %.2f requests/s", PLUGIN_NAME, _rate.rate)
+
+
+def _is_transient(reply, error):
+    """Tells if a failed request may succeed when retried"""
+    if isinstance(error, LastfmError):
+        return error.code in LASTFM_TRANSIENT_ERRORS
+    status = _http_status(reply)
+    # No status at all means the connection itself failed
+    return status is None or status == 429 or status >= 500
+
+
+def _min_count(cfg, track=None):
+    """Returns the lowest tag count of a lookup the minimum weight options keep, None if there is none"""
+    sally, factor = _lookup_weights(cfg, track)
+    if not factor:
+        return None
+    # Like in _select_tags, only the tags of the artists used to extend the track tags get the artist minimum
+    minimum = cfg["lastfm_min_artisttag_weight"] if sally == 1 else cfg["lastfm_min_tracktag_weight"]
+    return minimum / factor
+
+
+def _cache_response(album, cachetag, data, reply, error, track=None):
+    """Parses a response into the cache.
+
+    Returns its {tag id: count}, or None if the request failed transiently and should be retried; such
+    failures are not cached at all. Lookups without tags are cached for a shorter time than others.
+    The streaming and JSON parsers stop at the first tag below the minimum weight.
+    """
+    cfg = album.tagger.config.setting
+    start = _stats.clock()
+    try:
+        tag_to_count = _parse_tags(data, cfg, _min_count(cfg, track))
+    except LastfmError as e:
+        log.debug("%s: %s for %r", PLUGIN_NAME, e, cachetag)
+        tag_to_count = {}
+        error = e
+    _stats.add_time("parse", _stats.clock() - start)
+    _rate_feedback(reply, error)
+    negative_ttl = cfg["lastfm_negative_cache_days"] * DAY
+    if not error:
+        _cache.put(cachetag, tag_to_count, ttl=None if tag_to_count else negative_ttl)
+    elif _is_transient(reply, error):
+        return None
+    elif isinstance(error, LastfmError) and error.code == LASTFM_ERROR_NOT_FOUND:
+        _cache.put(cachetag, tag_to_count, ttl=negative_ttl)
+    else:
+        # Don't keep the empty result of a failed request beyond this session
+        _cache.put(cachetag, tag_to_count, persist=False)
+    return tag_to_count
+
 
-        _cache[cachetag] = tag_to_count
-        tags = apply_translations_and_sally(tag_to_count, sally, factor)
-        _tags_finalize(album, metadata, current + tags, get_next)
+def _request_finished(album):
+    # noinspection PyProtectedMember
+    album._requests -= 1
+    try:
+        # noinspection PyProtectedMember
+        album._finalize_loading(None)
+    except AttributeError:
+        return
 
-        # Process any pending requests for the same URL
-        if cachetag in _pending_xmlws_requests:
-            pending = _pending_xmlws_requests[cachetag]
-            del _pending_xmlws_requests[cachetag]
-            for delayed_call in pending:
-                delayed_call()
 
+def _tags_downloaded(album, cachetag, queryargs, attempt, data, reply, error):
+    tag_to_count = {}
+    retrying = False
+    try:
+        result = _cache_response(album, cachetag, data, reply, error, queryargs.get("track"))
+        if result is not None:
+            tag_to_count = result
+        elif attempt < MAX_ATTEMPTS:
+            delay = backoff_delay(attempt, RETRY_DELAY, RETRY_MAX_DELAY)
+            log.debug("%s: request for %r failed (%s), retrying in %.1f s", PLUGIN_NAME, cachetag, error, delay)
+            _request_tags(album, queryargs, partial(_tags_downloaded, album, cachetag, queryargs, attempt + 1),
+                          delay)
+            retrying = True
+            _stats.count("retries")
+        else:
+            _stats.count("failures")
+            log.warning("%s: request for %r failed %d times, giving up", PLUGIN_NAME, cachetag, attempt)
     except Exception:
         album.tagger.log.error("Problem processing downloaded tags in last.fm plus plugin: %s", traceback.format_exc())
         raise
     finally:
-        # noinspection PyProtectedMember
-        album._requests -= 1
-        try:
-            # noinspection PyProtectedMember
-            album._finalize_loading(None)
-        except AttributeError:
-            return
-
-
-def get_tags(album, metadata, artist, get_next, current, track=None, cachetag=None):
-    """Get tags from an URL."""
+        # Resolve the lookup even if the response was unusable, so nothing waits on it forever
+        if not retrying:
+            _inflight.finish(cachetag, tag_to_count)
+        _request_finished(album)
 
-    # Ensure config is loaded (or reloaded if has been changed)
-    _lazy_load_filters(album.tagger.config.setting)
-
-    if not cachetag:
-        cachetag = artist
 
+def _make_queryargs(album, artist, track=None):
     queryargs = {
         "api_key": album.tagger.config.setting["lastfm_api_key"],
         "artist": artist,
         "method": "Artist.getTopTags",
     }
-
-    sally = 2
-    if album.tagger.config.setting["lastfm_artist_tag_us_ex"]:
-        sally = 1
-    factor = album.tagger.config.setting["lastfm_artist_tags_weight"] / 100.0
     if track:
         queryargs["method"] = "Track.getTopTags"
         queryargs["track"] = track
-        cachetag += track
-        sally = 0
-        factor = 1.0
+    return queryargs
+
+
+def _request_tags(album, queryargs, handler, delay=0.0):
+    # The streaming and JSON parsers work on the raw response, the default one on Picard's parsed XML
+    response_parser = album.tagger.config.setting["lastfm_response_parser"]
+    if response_parser == "json":
+        queryargs = dict(queryargs, format="json")
+    if response_parser in ("xml-stream", "json"):
+        parse_response_type = None
+    else:
+        parse_response_type = "xml"
+    # noinspection PyProtectedMember
+    album._requests += 1
+    send = partial(_send_request, album, queryargs, handler, parse_response_type, _stats.clock())
+    if album.tagger.config.setting["lastfm_adaptive_rate"]:
+        send = partial(_queue_request, send)
+    if delay > 0:
+        QtCore.QTimer.singleShot(int(delay * 1000), send)
+    else:
+        send()
+
+
+def _queue_request(send):
+    _pending_requests.append(send)
+    if _send_timer is None or not _send_timer.isActive():
+        _send_pending_requests()
+
 
-    if cachetag in _cache:
-        tags = apply_translations_and_sally(_cache[cachetag], sally, factor)
-        _tags_finalize(album, metadata, current + tags, get_next)
+def _send_pending_requests():
+    """Sends the queued requests as far as the rate control allows, and waits for the token of the next one.
+
+    Tokens are only taken when a request is sent, so slowing down after a refusal applies to the whole queue.
+    """
+    global _send_timer
+    while _pending_requests:
+        wait = _rate.acquire()
+        if wait > 0:
+            if _send_timer is None:
+                _send_timer = QtCore.QTimer()
+                _send_timer.setSingleShot(True)
+                _send_timer.timeout.connect(_send_pending_requests)
+            _send_timer.start(int(wait * 1000) + 1)
+            return
+        _pending_requests.popleft()()
+
+
+def _send_request(album, queryargs, handler, parse_response_type, queued):
+    sent = _stats.clock()
+    _stats.add_time("enqueue", sent - queued)
+    _stats.count("requests")
+    album.tagger.webservice.get(LASTFM_HOST, LASTFM_PORT, LASTFM_PATH, partial(_response_received, handler, sent),
+                                parse_response_type=parse_response_type, queryargs=queryargs, priority=True,
+                                important=True)
+    _start_stats_log()
+
+
+def _response_received(handler, sent, data, reply, error):
+    _stats.add_time("network", _stats.clock() - sent)
+    handler(data, reply, error)
+
+
+def _title_normaliser(cfg):
+    """Returns the TitleNormaliser for the options, or None if track titles are looked up as they are"""
+    global _normaliser
+    if not cfg["lastfm_normalise_titles"]:
+        return None
+    if _normaliser is None or _normaliser.suffixes != cfg["lastfm_title_suffixes"]:
+        _normaliser = TitleNormaliser(cfg["lastfm_title_suffixes"])
+    return _normaliser
+
+
+def lookup_tags(album, artist, track=None):
+    """Returns a Future of the {tag id: count} of an artist or track lookup.
+
+    The result comes from the cache if possible. Otherwise the future of the request already in flight for
+    the same lookup is shared, or a new request is sent on behalf of ``album``. With title normalisation on,
+    track lookups are keyed by the normalised title, so the versions of a track share one request.
+    """
+    key = track
+    if track:
+        normaliser = _title_normaliser(album.tagger.config.setting)
+        if normaliser is not None:
+            track = normaliser.strip(track)
+            key = normaliser.key(track)
+    queryargs = _make_queryargs(album, artist, track)
+    cachetag = make_cachetag(queryargs["method"], artist, key)
+    future = _inflight.get(cachetag)
+    if future is not None:
+        _stats.count("coalesced")
     else:
+        cached = _cache.get(cachetag)
+        if cached is not None:
+            _stats.count("cache_hits")
+            return resolved(cached)
+        _stats.count("cache_misses")
+        future = _inflight.start(cachetag)
+        _request_tags(album, queryargs, partial(_tags_downloaded, album, cachetag, queryargs, 1))
+    return future
 
-        # If we have already sent a request for this URL, delay this call until later
-        if cachetag in _pending_xmlws_requests:
-            _pending_xmlws_requests[cachetag].append(
-                partial(get_tags, album, metadata, artist, get_next, current, track=track, cachetag=cachetag))
+
+def prefetch_tags(album, artist, track=None):
+    """Requests tags ahead of time, so later lookups are answered from the cache or share the request"""
+    lookup_tags(album, artist, track)
+
+
+def _lookup_weights(cfg, track=None):
+    """Returns the (sally, factor) applied to the tags of a lookup"""
+    if track:
+        return 0, 1.0
+    sally = 2
+    if cfg["lastfm_artist_tag_us_ex"]:
+        sally = 1
+    return sally, cfg["lastfm_artist_tags_weight"] / 100.0
+
+
+def _consensus_tags(filters, weights, results):
+    """Merges the lookups of a release into one tag list.
+
+    The weight of a tag is averaged over the lookups of its kind (track or artist tags) which found any tags.
+    """
+    totals = {}
+    counts = {}
+    for (sally, factor), tag_to_count in zip(weights, results):
+        if not tag_to_count:
+            continue
+        counts[sally] = counts.get(sally, 0) + 1
+        for tag_id, (weight, stype) in apply_translations_and_sally(filters, tag_to_count, sally, factor):
+            totals[(tag_id, stype)] = totals.get((tag_id, stype), 0) + weight
+    return [(tag_id, [weight / counts[stype], stype]) for (tag_id, stype), weight in totals.items()]
+
+
+def _track_tags_ready(album, metadata, weights, consensus, waited, results):
+    start = _stats.clock()
+    try:
+        # The whole finalization works on one filter set, even if the options are saved meanwhile
+        filters = _lazy_load_filters(album.tagger.config.setting)
+        if consensus is not None:
+            # The tags of the release are selected once (again if the filters changed) and written to each track
+            if consensus["filters"] is not filters:
+                tags = _consensus_tags(filters, weights, results)
+                consensus["hold"] = _select_tags(album, tags, filters) if tags else None
+                consensus["filters"] = filters
+            if consensus["hold"] is not None:
+                _write_tags(album, metadata, consensus["hold"])
         else:
-            _pending_xmlws_requests[cachetag] = []
-            # noinspection PyProtectedMember
-            album._requests += 1
-            album.tagger.webservice.get(LASTFM_HOST, LASTFM_PORT, LASTFM_PATH,
-                                        partial(_tags_downloaded, album, metadata, sally, factor, get_next, current),
-                                        parse_response_type="xml", queryargs=queryargs, priority=True, important=True)
+            tags = []
+            for (sally, factor), tag_to_count in zip(weights, results):
+                tags.extend(apply_translations_and_sally(filters, tag_to_count, sally, factor))
+            _tags_finalize(album, metadata, tags, filters)
+    except Exception:
+        album.tagger.log.error("Problem processing downloaded tags in last.fm plus plugin: %s", traceback.format_exc())
+    finally:
+        _stats.add_time("finalize", _stats.clock() - start)
+        if waited:
+            _request_finished(album)
+
+
+def _finalize_when_done(album, metadata, weights, future, consensus=None):
+    if future.done:
+        _track_tags_ready(album, metadata, weights, consensus, False, future.result)
+    else:
+        # Keep the album loading until this track's tags are set, whichever album sent the requests
+        # noinspection PyProtectedMember
+        album._requests += 1
+        future.add_done_callback(partial(_track_tags_ready, album, metadata, weights, consensus, True))
+
+
+def _release_lookups(release, cfg):
+    """Returns the distinct artists and (artist, title) pairs of the tracks of a release, in release order"""
+    try:
+        standardize_tracks = cfg["standardize_tracks"]
+    except KeyError:
+        standardize_tracks = False
+
+    normaliser = _title_normaliser(cfg)
+    artists = []
+    tracks = []
+    keys = set()
+    for medium in release.get("media", []):
+        for track in medium.get("tracks", []):
+            # Same credit and name translation as the "artist" tag process_track looks the track up with
+            artist = artist_credit_from_node(track.get("artist-credit") or release.get("artist-credit", []))[0]
+            if not artist:
+                continue
+            if artist not in artists:
+                artists.append(artist)
+            if standardize_tracks and "recording" in track:
+                title = track["recording"].get("title")
+            else:
+                title = track.get("title")
+            if not title:
+                continue
+            # Versions of the same track are looked up once
+            key = (artist, normaliser.key(title) if normaliser is not None else title)
+            if key not in keys:
+                keys.add(key)
+                tracks.append((artist, title))
+    return artists, tracks
+
+
+def _sample(items, count):
+    """Picks ``count`` items spread evenly over ``items``"""
+    if count >= len(items):
+        return list(items)
+    return [items[index * len(items) // count] for index in range(count)]
 
 
 def process_track(album, metadata, release, track):
     tagger = album.tagger
-    use_track_tags = tagger.config.setting["lastfm_use_track_tags"]
-    use_artist_tags = tagger.config.setting["lastfm_artist_tag_us_ex"] or tagger.config.setting[
-        "lastfm_artist_tag_us_yes"]
+    cfg = tagger.config.setting
+    use_track_tags = cfg["lastfm_use_track_tags"]
+    use_artist_tags = cfg["lastfm_artist_tag_us_ex"] or cfg["lastfm_artist_tag_us_yes"]
 
     if use_track_tags or use_artist_tags:
+        if cfg["lastfm_album_consensus"]:
+            consensus = ALBUM_CONSENSUS.get(album.id)
+            if consensus is not None:
+                _finalize_when_done(album, metadata, consensus["weights"], consensus["future"], consensus)
+                return
+
         artist = metadata["artist"]
         title = metadata["title"]
         if artist:
-            if use_artist_tags:
-                get_artist_tags_func = partial(get_tags, album, metadata, artist, None)
-            else:
-                get_artist_tags_func = None
+            # Ensure config is loaded (or reloaded if has been changed)
+            _lazy_load_filters(cfg)
+
+            # Both lookups are attached at once; the artist one is shared by every track of the artist
+            lookups = []
             if title and use_track_tags:
-                get_tags(album, metadata, artist, get_artist_tags_func, [], track=title)
-            elif get_artist_tags_func:
-                get_artist_tags_func([])
+                lookups.append(title)
+            if use_artist_tags:
+                lookups.append(None)
+            if not lookups:
+                return
+            weights = [_lookup_weights(cfg, lookup) for lookup in lookups]
+            _finalize_when_done(album, metadata, weights,
+                                gather([lookup_tags(album, artist, lookup) for lookup in lookups]))
+
+
+def process_album(album, metadata, release):
+    """Queues the artist and track tag lookups of the whole release before its tracks are processed.
+
+    Lookups are deduplicated, artist lookups (shared by many tracks) go first. process_track then only
+    picks the results up from the cache, or waits on the request already in flight.
+
+    In album consensus mode, the lookups of all artists and of a sample of the tracks are gathered into one
+    tag list for the release, which process_track applies to every track.
+    """
+    cfg = album.tagger.config.setting
+    use_track_tags = cfg["lastfm_use_track_tags"]
+    use_artist_tags = cfg["lastfm_artist_tag_us_ex"] or cfg["lastfm_artist_tag_us_yes"]
+    consensus = cfg["lastfm_album_consensus"]
+    ALBUM_CONSENSUS.pop(album.id, None)
+    if not (consensus or cfg["lastfm_prefetch_album_tags"]) or not (use_track_tags or use_artist_tags):
+        return
+
+    _lazy_load_filters(cfg)
+    artists, tracks = _release_lookups(release, cfg)
+
+    if consensus:
+        lookups = []
+        if use_artist_tags:
+            lookups.extend((artist, None) for artist in artists)
+        if use_track_tags:
+            lookups.extend(_sample(tracks, cfg["lastfm_consensus_sample_tracks"]))
+        if lookups:
+            _watch_album_removal(album.tagger)
+            ALBUM_CONSENSUS[album.id] = {
+                "weights": [_lookup_weights(cfg, title) for artist, title in lookups],
+                "future": gather([lookup_tags(album, artist, title) for artist, title in lookups]),
+                # Filter set the tags were selected with, and the selected tags
+                "filters": None,
+                "hold": None,
+            }
+        return
+
+    if use_artist_tags:
+        for artist in artists:
+            prefetch_tags(album, artist)
+    if use_track_tags:
+        for artist, title in tracks:
+            prefetch_tags(album, artist, title)
+
+
+SNAPSHOT_FILE_FILTER = "Filter snapshots (*.lfmfilters);;All Files (*)"
+# Names of the filter lists in the tag list check, and how many of its issues are shown at a time
+GROUP_LABELS = {
+    "major": "Major",
+    "minor": "Minor",
+    "country": "Countries",
+    "city": "Cities",
+    "decade": "Decades",
+    "year": "Years",
+    "mood": "Moods",
+    "occasion": "Occasions",
+    "category": "Categories",
+}
+CONFLICT_BATCH_SIZE = 50
 
 
 class LastfmOptionsPage(OptionsPage):
@@ -1077,6 +1334,21 @@ class LastfmOptionsPage(OptionsPage):
         IntOption("setting", "lastfm_artist_tags_weight", 95),
         IntOption("setting", "lastfm_min_artisttag_weight", 10),
         IntOption("setting", "lastfm_max_artisttag_drop", 80),
+        BoolOption("setting", "lastfm_persistent_cache", True),
+        IntOption("setting", "lastfm_cache_ttl_days", 30),
+        IntOption("setting", "lastfm_cache_max_entries", 50000),
+        IntOption("setting", "lastfm_negative_cache_days", 3),
+        BoolOption("setting", "lastfm_prefetch_album_tags", True),
+        BoolOption("setting", "lastfm_album_consensus", False),
+        IntOption("setting", "lastfm_consensus_sample_tracks", 3),
+        BoolOption("setting", "lastfm_adaptive_rate", True),
+        IntOption("setting", "lastfm_rate_burst", 20),
+        BoolOption("setting", "lastfm_array_scoring", False),
+        TextOption("setting", "lastfm_response_parser", "xml"),
+        IntOption("setting", "lastfm_max_parsed_tags", 100),
+        TextOption("setting", "lastfm_filter_snapshot", ""),
+        BoolOption("setting", "lastfm_normalise_titles", False),
+        TextOption("setting", "lastfm_title_suffixes", DEFAULT_TITLE_SUFFIXES),
         TextOption("setting", "lastfm_genre_major", ",".join(GENRE_FILTER["major"]).lower()),
         TextOption("setting", "lastfm_genre_minor", ",".join(GENRE_FILTER["minor"]).lower()),
         TextOption("setting", "lastfm_genre_decade", ", ".join(GENRE_FILTER["decade"]).lower()),
@@ -1099,6 +1371,10 @@ class LastfmOptionsPage(OptionsPage):
         self.ui.check_word_lists.clicked.connect(self.check_words)
         self.ui.load_default_lists.clicked.connect(self.load_defaults)
         self.ui.filter_report.clicked.connect(self.create_report)
+        self.ui.browse_filter_snapshot.clicked.connect(self.browse_snapshot)
+        self.ui.export_filter_snapshot.clicked.connect(self.export_snapshot)
+        self.ui.refresh_statistics.clicked.connect(self.show_statistics)
+        self.ui.reset_statistics.clicked.connect(self.reset_statistics)
 
     # function to check all translations and make sure a corresponding word
     # exists in word lists, notify in message translations pointing nowhere.
@@ -1113,44 +1389,58 @@ class LastfmOptionsPage(OptionsPage):
     #        QtGui.QMessageBox.information(
     #            self, self.tr("QMessageBox.showInformation()"), ",".join(tr2))
 
-    # function to check that word lists contain no duplicate entries, notify
-    # in message duplicates and which lists they appear in
+    # function to check that word lists contain no duplicate entries nor terms matched by a wildcard searched
+    # before them. The lists are checked in a worker thread and the issues shown as they are found.
     def check_words(self):
-        # cfg = self.config.setting
-        # Create a set for each option cfg option
-
-        word_sets = {
-            "Major": set(str(self.ui.genre_major.text()).split(",")),
-            "Minor": set(str(self.ui.genre_minor.text()).split(",")),
-            "Countries": set(str(self.ui.genre_country.text()).split(",")),
-            "Cities": set(str(self.ui.genre_city.text()).split(",")),
-            "Moods": set(str(self.ui.genre_mood.text()).split(",")),
-            "Occasions": set(str(self.ui.genre_occasion.text()).split(",")),
-            "Decades": set(str(self.ui.genre_decade.text()).split(",")),
-            "Years": set(str(self.ui.genre_year.text()).split(",")),
-            "Categories": set(str(self.ui.genre_category.text()).split(","))
-        }
-
+        groups = [(group, split_terms(getattr(self.ui, "genre_" + group).text().lower())) for group in FILTER_GROUPS]
+        self.ui.check_word_lists.setEnabled(False)
+        self.ui.word_list_issues.clear()
+        self.ui.word_list_issues.show()
+        self._word_list_issues = 0
+        thread.run_task(partial(self._find_conflicts, groups, self._show_conflicts), self._conflicts_found)
+
+    @staticmethod
+    def _find_conflicts(groups, report):
+        batch = []
+        for conflict in find_conflicts(groups):
+            batch.append(conflict)
+            if len(batch) >= CONFLICT_BATCH_SIZE:
+                thread.to_main(report, batch)
+                batch = []
+        return batch
+
+    def _show_conflicts(self, conflicts):
         text = []
-        duplicates = {}
-
-        for name, words in word_sets.items():
-            for word in words:
-                word = word.strip().title()
-                duplicates.setdefault(word, []).append(name)
-
-        for word, names in duplicates.items():
-            if len(names) > 1:
-                names = "%s and %s" % (", ".join(names[:-1]), names.pop())
-                text.append('"%s" in %s lists.' % (word, names))
-
-        if not text:
-            text = "No issues found."
-        else:
-            text = "\n\n".join(text)
+        for term, group, other, wildcard in conflicts:
+            if wildcard is None and group == other:
+                text.append('"%s" twice in %s list.' % (term, GROUP_LABELS[group]))
+            elif wildcard is None:
+                text.append('"%s" in %s and %s lists.' % (term, GROUP_LABELS[other], GROUP_LABELS[group]))
+            elif group == other:
+                text.append('"%s" in %s list is already matched by "%s".' % (term, GROUP_LABELS[group], wildcard))
+            else:
+                text.append('"%s" in %s list is matched by "%s" in %s list first.' % (
+                    term, GROUP_LABELS[group], wildcard, GROUP_LABELS[other]))
+        self._word_list_issues += len(text)
+        try:
+            self.ui.word_list_issues.appendPlainText("\n".join(text))
+        except RuntimeError:
+            # The options dialog was closed before the check finished
+            pass
 
-        # Display results in information box
-        # QtGui.QMessageBox.information(self, self.tr("QMessageBox.showInformation()"), text)
+    def _conflicts_found(self, result=None, error=None):
+        if error:
+            log.error("%s: checking the tag lists failed: %s", PLUGIN_NAME, error)
+        elif result:
+            self._show_conflicts(result)
+        try:
+            if self._word_list_issues:
+                self.ui.word_list_issues.appendPlainText("%d issues found." % self._word_list_issues)
+            else:
+                self.ui.word_list_issues.appendPlainText("No issues found.")
+            self.ui.check_word_lists.setEnabled(True)
+        except RuntimeError:
+            pass
 
     # load/reload defaults
     def load_defaults(self):
@@ -1368,6 +1658,32 @@ class LastfmOptionsPage(OptionsPage):
         # Display results in information box
         # QtGui.QMessageBox.information(self, self.tr("QMessageBox.showInformation()"), text)
 
+    def browse_snapshot(self):
+        file_name, _filter = QtWidgets.QFileDialog.getOpenFileName(self, self.tr("Select filter snapshot"),
+                                                                   self.ui.filter_snapshot.text(),
+                                                                   self.tr(SNAPSHOT_FILE_FILTER))
+        if file_name:
+            self.ui.filter_snapshot.setText(file_name)
+
+    # Writes the saved lists and translations, compiled, to a snapshot file other installations can load
+    def export_snapshot(self):
+        file_name, _filter = QtWidgets.QFileDialog.getSaveFileName(self, self.tr("Export filter snapshot"),
+                                                                   self.ui.filter_snapshot.text(),
+                                                                   self.tr(SNAPSHOT_FILE_FILTER))
+        if not file_name:
+            return
+        try:
+            save_snapshot(FilterSet.build(self.config.setting), file_name)
+        except OSError as e:
+            QtWidgets.QMessageBox.warning(self, self.tr("Export filter snapshot"), str(e))
+
+    def show_statistics(self):
+        self.ui.statistics.setPlainText(format_stats(statistics()))
+
+    def reset_statistics(self):
+        _stats.reset()
+        self.show_statistics()
+
     def load(self):
         # general
         cfg = self.config.setting
@@ -1392,6 +1708,23 @@ class LastfmOptionsPage(OptionsPage):
         self.ui.artist_tags_weight.setValue(cfg["lastfm_artist_tags_weight"])
         self.ui.min_artisttag_weight.setValue(cfg["lastfm_min_artisttag_weight"])
         self.ui.max_artisttag_drop.setValue(cfg["lastfm_max_artisttag_drop"])
+        self.ui.persistent_cache.setChecked(cfg["lastfm_persistent_cache"])
+        self.ui.cache_ttl_days.setValue(cfg["lastfm_cache_ttl_days"])
+        self.ui.cache_max_entries.setValue(cfg["lastfm_cache_max_entries"])
+        self.ui.negative_cache_days.setValue(cfg["lastfm_negative_cache_days"])
+        self.ui.prefetch_album_tags.setChecked(cfg["lastfm_prefetch_album_tags"])
+        self.ui.album_consensus.setChecked(cfg["lastfm_album_consensus"])
+        self.ui.consensus_sample_tracks.setValue(cfg["lastfm_consensus_sample_tracks"])
+        self.ui.adaptive_rate.setChecked(cfg["lastfm_adaptive_rate"])
+        self.ui.rate_burst.setValue(cfg["lastfm_rate_burst"])
+        self.ui.normalise_titles.setChecked(cfg["lastfm_normalise_titles"])
+        self.ui.title_suffixes.setText(cfg["lastfm_title_suffixes"])
+        self.ui.array_scoring.setChecked(cfg["lastfm_array_scoring"])
+        self.ui.response_parser.setCurrentIndex(max(0, self.ui.response_parser.findData(
+            cfg["lastfm_response_parser"])))
+        self.ui.max_parsed_tags.setValue(cfg["lastfm_max_parsed_tags"])
+        self.ui.filter_snapshot.setText(cfg["lastfm_filter_snapshot"])
+        self.show_statistics()
         self.ui.genre_major.setText(cfg["lastfm_genre_major"].replace(",", ", "))
         self.ui.genre_minor.setText(cfg["lastfm_genre_minor"].replace(",", ", "))
         self.ui.genre_decade.setText(cfg["lastfm_genre_decade"].replace(",", ", "))
@@ -1426,6 +1759,21 @@ class LastfmOptionsPage(OptionsPage):
         self.config.setting["lastfm_artist_tags_weight"] = self.ui.artist_tags_weight.value()
         self.config.setting["lastfm_min_artisttag_weight"] = self.ui.min_artisttag_weight.value()
         self.config.setting["lastfm_max_artisttag_drop"] = self.ui.max_artisttag_drop.value()
+        self.config.setting["lastfm_persistent_cache"] = self.ui.persistent_cache.isChecked()
+        self.config.setting["lastfm_cache_ttl_days"] = self.ui.cache_ttl_days.value()
+        self.config.setting["lastfm_cache_max_entries"] = self.ui.cache_max_entries.value()
+        self.config.setting["lastfm_negative_cache_days"] = self.ui.negative_cache_days.value()
+        self.config.setting["lastfm_prefetch_album_tags"] = self.ui.prefetch_album_tags.isChecked()
+        self.config.setting["lastfm_album_consensus"] = self.ui.album_consensus.isChecked()
+        self.config.setting["lastfm_consensus_sample_tracks"] = self.ui.consensus_sample_tracks.value()
+        self.config.setting["lastfm_adaptive_rate"] = self.ui.adaptive_rate.isChecked()
+        self.config.setting["lastfm_rate_burst"] = self.ui.rate_burst.value()
+        self.config.setting["lastfm_normalise_titles"] = self.ui.normalise_titles.isChecked()
+        self.config.setting["lastfm_title_suffixes"] = self.ui.title_suffixes.text()
+        self.config.setting["lastfm_array_scoring"] = self.ui.array_scoring.isChecked()
+        self.config.setting["lastfm_response_parser"] = self.ui.response_parser.currentData()
+        self.config.setting["lastfm_max_parsed_tags"] = self.ui.max_parsed_tags.value()
+        self.config.setting["lastfm_filter_snapshot"] = self.ui.filter_snapshot.text().strip()
 
         # parse littlebit the text-inputs
         tmp0 = {}
@@ -1494,5 +1842,6 @@ class LastfmOptionsPage(OptionsPage):
         GENRE_FILTER["_loaded_"] = False
 
 
+register_album_metadata_processor(process_album)
 register_track_metadata_processor(process_track)
 register_options_page(LastfmOptionsPage)
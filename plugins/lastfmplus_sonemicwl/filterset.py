@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+from .normalise import TranslationTable, fold_tag
+from .tagfilter import FILTER_GROUPS, TagClassifier, split_terms, split_translations
+
+TRANSLATIONS_OPTION = "lastfm_genre_translations"
+GROUP_OPTIONS = {group: "lastfm_genre_" + group for group in FILTER_GROUPS}
+SOURCE_OPTIONS = tuple(GROUP_OPTIONS.values()) + (TRANSLATIONS_OPTION,)
+
+
+class FilterSet(object):
+    """The filter lists and translations compiled from the options.
+
+    A set is never modified once built. Reloading builds a new one with build(), which the caller swaps in
+    with a single assignment, so a finalization holding a set never sees it half loaded.
+    """
+
+    def __init__(self, sources, groups, translate, classifier, translated=None):
+        # Option text the set was built from, by option name
+        self.sources = sources
+        # Terms by filter group
+        self.groups = groups
+        self.translate = translate
+        self.classifier = classifier
+        # Memo of tag id -> translated tag id
+        self.translated = {} if translated is None else translated
+
+    @classmethod
+    def build(cls, cfg, previous=None, names=None):
+        """Builds the set for the options in ``cfg``.
+
+        Only the options whose text differs from the ones ``previous`` was built from are parsed again. The
+        classifier and translation table compile only the lists which changed and take over the compiled
+        lists (with their memos) of the others. The memo of translated tag ids is kept when the translations
+        did not change, without the tags a changed list may translate differently; that needs ``names``,
+        mapping a tag id to its name. Returns ``previous`` itself if no option changed.
+        """
+        sources = {name: cfg[name] for name in SOURCE_OPTIONS}
+        if previous is None:
+            changed = set(SOURCE_OPTIONS)
+        else:
+            changed = {name for name in SOURCE_OPTIONS if sources[name] != previous.sources.get(name)}
+            if not changed:
+                return previous
+
+        groups = {}
+        for group, name in GROUP_OPTIONS.items():
+            groups[group] = split_terms(sources[name]) if name in changed else previous.groups[group]
+        ordered = [(group, groups[group]) for group in FILTER_GROUPS]
+        if previous is None:
+            classifier = TagClassifier(ordered)
+            translate = TranslationTable(split_translations(sources[TRANSLATIONS_OPTION]), ordered)
+            return cls(sources, groups, translate, classifier)
+
+        changed_groups = [group for group in FILTER_GROUPS if GROUP_OPTIONS[group] in changed]
+        kept = [group for group in FILTER_GROUPS if group not in changed_groups]
+        if changed_groups:
+            classifier = TagClassifier(ordered, {group: previous.classifier.matchers[group] for group in kept})
+        else:
+            classifier = previous.classifier
+        folds = {group: previous.translate.folds[group] for group in kept}
+        if TRANSLATIONS_OPTION in changed:
+            translate = TranslationTable(split_translations(sources[TRANSLATIONS_OPTION]), ordered, folds)
+            translated = None
+        else:
+            translate = previous.translate.with_groups(ordered, folds)
+            translated = None
+            if names is not None:
+                affected_names, affected_keys = translate.affected(previous.translate, changed_groups)
+                translated = {}
+                for tag_id, target in previous.translated.items():
+                    name = names(tag_id)
+                    if name not in affected_names and fold_tag(name) not in affected_keys:
+                        translated[tag_id] = target
+        return cls(sources, groups, translate, classifier, translated)
+
+    def changed_options(self, previous):
+        """Names of the source options which differ from the ones ``previous`` was built from"""
+        if previous is None:
+            return list(SOURCE_OPTIONS)
+        return [name for name in SOURCE_OPTIONS if self.sources[name] != previous.sources.get(name)]
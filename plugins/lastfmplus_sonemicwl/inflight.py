@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+
+class Future(object):
+    """The result of a lookup that may still be in flight.
+
+    Continuations attached with add_done_callback run once with the result, immediately if it is
+    already known. Everything runs on the thread resolving the future (Picard's main thread).
+    """
+
+    __slots__ = ("done", "result", "_callbacks")
+
+    def __init__(self):
+        self.done = False
+        self.result = None
+        self._callbacks = []
+
+    def add_done_callback(self, callback):
+        if self.done:
+            callback(self.result)
+        else:
+            self._callbacks.append(callback)
+
+    def set_result(self, result):
+        if self.done:
+            return
+        self.done = True
+        self.result = result
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(result)
+
+
+def resolved(result):
+    """Returns a future which is already done"""
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def gather(futures):
+    """Returns a future of the list of results of ``futures``, in the same order, done once all of them are"""
+    combined = Future()
+    results = [None] * len(futures)
+    remaining = [len(futures)]
+
+    def collect(index, result):
+        results[index] = result
+        remaining[0] -= 1
+        if not remaining[0]:
+            combined.set_result(results)
+
+    if not futures:
+        combined.set_result(results)
+    for index, future in enumerate(futures):
+        future.add_done_callback(lambda result, index=index: collect(index, result))
+    return combined
+
+
+class InflightRegistry(object):
+    """Futures of the requests currently in flight, keyed by request"""
+
+    def __init__(self):
+        self._futures = {}
+
+    def __contains__(self, key):
+        return key in self._futures
+
+    def __len__(self):
+        return len(self._futures)
+
+    def get(self, key):
+        return self._futures.get(key)
+
+    def start(self, key):
+        """Registers and returns the future of a request about to be sent"""
+        future = self._futures[key] = Future()
+        return future
+
+    def finish(self, key, result):
+        """Drops the request from the registry and resolves its future, running all continuations"""
+        future = self._futures.pop(key, None)
+        if future is not None:
+            future.set_result(result)
+
+    def clear(self):
+        self._futures.clear()
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+
+import re
+import unicodedata
+from functools import lru_cache
+
+
+@lru_cache(maxsize=65536)
+def fold_tag(name):
+    """Folds a tag name to the key its spelling variants share.
+
+    The name is NFKC normalised and casefolded, then punctuation and whitespace are dropped:
+
+    >>> fold_tag("Hip Hop") == fold_tag("hip-hop") == fold_tag("HipHop")
+    True
+    >>> fold_tag("R&B")
+    'rb'
+    >>> fold_tag("ｐｏｓｔ－ｒｏｃｋ")
+    'postrock'
+    """
+    folded = unicodedata.normalize("NFKC", name).casefold()
+    return "".join(char for char in folded
+                   if not char.isspace() and not unicodedata.category(char).startswith("P"))
+
+
+class TermFolds(object):
+    """The terms of one filter list by their folded keys (see fold_tag), for TranslationTable"""
+
+    def __init__(self, terms):
+        self.known = set()
+        self.folded = {}
+        for term in terms:
+            if '*' not in term:
+                self.known.add(term)
+                self.folded.setdefault(fold_tag(term), term)
+
+    def state(self):
+        return {"known": sorted(self.known), "folded": self.folded}
+
+    @classmethod
+    def from_state(cls, state):
+        folds = cls.__new__(cls)
+        folds.known = set(state["known"])
+        folds.folded = dict(state["folded"])
+        return folds
+
+
+class TranslationTable(object):
+    """Maps tag names (lowercased) to the names they are written as.
+
+    Besides the exact translations, every translation source and every filter list term is entered by its
+    folded key (see fold_tag), so a variant spelling of either finds the same name without being listed.
+    Exact translations come first, and a name which is itself a filter list term is kept as it is. The terms
+    are folded per filter list, so a table for changed lists takes over the folds of the others.
+    """
+
+    def __init__(self, translations, groups=(), folds=None):
+        # groups: sequence of (group name, list of terms), in search order; folds: TermFolds by group name to
+        # take over instead of folding the terms again
+        self.exact = dict(translations)
+        self.sources = {}
+        for source, target in self.exact.items():
+            self.sources.setdefault(fold_tag(source), target)
+        self._set_groups(groups, folds)
+
+    def _set_groups(self, groups, folds):
+        folds = folds or {}
+        self.folds = {group: folds[group] if group in folds else TermFolds(terms) for group, terms in groups}
+        self._search = list(self.folds.values())
+
+    def with_groups(self, groups, folds=None):
+        """Returns a table of the same translations for other filter lists, see __init__()"""
+        table = self.__class__.__new__(self.__class__)
+        table.exact = self.exact
+        table.sources = self.sources
+        table._set_groups(groups, folds)
+        return table
+
+    def affected(self, previous, groups):
+        """Tells which names may translate differently than with ``previous``, of the same translations.
+
+        Returns the terms and the folded keys of the ``groups`` in either table; names which are none of the
+        terms and whose key is none of the keys translate the same.
+        """
+        names = set()
+        keys = set()
+        for group in groups:
+            for folds in (previous.folds.get(group), self.folds.get(group)):
+                if folds is not None:
+                    names.update(folds.known)
+                    keys.update(folds.folded)
+        return names, keys
+
+    def __len__(self):
+        return len(self.exact)
+
+    def state(self):
+        """Returns the table as plain data, see from_state()"""
+        return {
+            "exact": self.exact,
+            "sources": self.sources,
+            "groups": [[group, folds.state()] for group, folds in self.folds.items()],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Restores a table from state() without folding every key again"""
+        table = cls.__new__(cls)
+        table.exact = dict(state["exact"])
+        table.sources = dict(state["sources"])
+        table._set_groups([(group, None) for group, _ in state["groups"]],
+                          {group: TermFolds.from_state(folds) for group, folds in state["groups"]})
+        return table
+
+    def translate(self, name):
+        try:
+            return self.exact[name]
+        except KeyError:
+            pass
+        for folds in self._search:
+            if name in folds.known:
+                return name
+        key = fold_tag(name)
+        if not key:
+            return name
+        try:
+            return self.sources[key]
+        except KeyError:
+            pass
+        for folds in self._search:
+            try:
+                return folds.folded[key]
+            except KeyError:
+                pass
+        return name
+
+
+# Words marking a version of a recording rather than another track, used by default by TitleNormaliser
+DEFAULT_TITLE_SUFFIXES = ("remaster*, live, mono, stereo, radio edit, single version, album version, "
+                          "original mix, explicit, clean version, clean edit, bonus track, deluxe*, anniversary*")
+
+# A bracketed group or a dash separated part ending a title
+TITLE_SUFFIX = re.compile(r"\s*(?:[(\[]([^()\[\]]*)[)\]]|\s[-\u2013\u2014]\s+([^-\u2013\u2014]*))\s*$")
+# Words which may go with the version words in a suffix: years, numbers and the like
+TITLE_SUFFIX_FILLER = re.compile(r"\b(?:version|edit|edition|mix|\d+(?:st|nd|rd|th|s)?)\b", re.IGNORECASE)
+# Version words which also end many titles on their own, so are not enough for a dash separated suffix
+AMBIGUOUS_TITLE_SUFFIXES = ("live", "mono", "stereo", "clean")
+
+
+@lru_cache(maxsize=65536)
+def _strip_suffixes(title, words):
+    stripped = title
+    while True:
+        match = TITLE_SUFFIX.search(stripped)
+        if not match or match.start() == 0:
+            break
+        suffix = match.group(1) if match.group(1) is not None else match.group(2)
+        if match.group(2) is not None and suffix.strip().casefold() in AMBIGUOUS_TITLE_SUFFIXES:
+            break
+        # Only suffixes made of version words and filler go, not ones merely containing a version word
+        if not words.search(suffix) or re.search(r"\w", TITLE_SUFFIX_FILLER.sub(" ", words.sub(" ", suffix))):
+            break
+        stripped = stripped[:match.start()]
+    return stripped
+
+
+class TitleNormaliser(object):
+    """Reduces the versions of a track title to one lookup key.
+
+    ``suffixes`` is the comma separated list of words marking a version, ``*`` matching the rest of a word.
+    strip() removes the bracketed or dash separated parts at the end of a title which consist of them, with
+    years, numbers and words like "version" or "edit":
+
+    >>> normaliser = TitleNormaliser(DEFAULT_TITLE_SUFFIXES)
+    >>> normaliser.strip("Song (Remastered 2011)")
+    'Song'
+    >>> normaliser.strip("Song (Live)")
+    'Song'
+    >>> normaliser.strip("Song - Live 1995 [2009 Remaster]")
+    'Song'
+    >>> normaliser.strip("Song - Radio Edit")
+    'Song'
+    >>> normaliser.strip("Song (25th Anniversary Deluxe Edition)")
+    'Song'
+
+    Parts with other words, and the words anywhere else in the title, are kept:
+
+    >>> normaliser.strip("Song (feat. Someone) [Remastered]")
+    'Song (feat. Someone)'
+    >>> normaliser.strip("Song [Live at Wembley]")
+    'Song [Live at Wembley]'
+    >>> normaliser.strip("Song - Live Forever")
+    'Song - Live Forever'
+    >>> normaliser.strip("Live - Live Forever")
+    'Live - Live Forever'
+    >>> normaliser.strip("Mono - Stereo Love")
+    'Mono - Stereo Love'
+    >>> normaliser.strip("Live and Let Die")
+    'Live and Let Die'
+    >>> normaliser.strip("(Live)")
+    '(Live)'
+
+    So is a dash separated "live", "mono", "stereo" or "clean" on its own, and "clean" is not a version word
+    by default:
+
+    >>> normaliser.strip("Song - Live")
+    'Song - Live'
+    >>> normaliser.strip("Love (Clean)")
+    'Love (Clean)'
+    >>> normaliser.strip("Love (Clean Version)")
+    'Love'
+
+    key() also casefolds and collapses whitespace, so differently cased titles share a key:
+
+    >>> normaliser.key("SONG  (Remastered)") == normaliser.key("song") == "song"
+    True
+    """
+
+    def __init__(self, suffixes):
+        words = [re.escape(word).replace(r"\*", r"\w*") for word in
+                 (word.strip() for word in suffixes.split(",")) if word]
+        self.suffixes = suffixes
+        self.words = re.compile(r"\b(?:%s)\b" % "|".join(words), re.IGNORECASE) if words else None
+
+    def strip(self, title):
+        """Returns ``title`` without its version suffixes"""
+        if self.words is None:
+            return title
+        return _strip_suffixes(title, self.words)
+
+    def key(self, title):
+        """Returns the lookup key of ``title``: stripped, casefolded and with whitespace collapsed"""
+        return " ".join(self.strip(title).casefold().split())
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+import json
+from xml.etree.ElementTree import ParseError, XMLPullParser
+
+
+class LastfmError(Exception):
+    """An error response of the Last.fm API"""
+
+    def __init__(self, code, message=""):
+        super(LastfmError, self).__init__(code, message)
+        self.code = code
+        self.message = message
+
+    def __str__(self):
+        return "Last.fm error %s: %s" % (self.code, self.message)
+
+
+def _to_count(text):
+    try:
+        return int(text.strip())
+    except (AttributeError, ValueError):
+        return 0
+
+
+def parse_toptags_node(document):
+    """Extracts {name: count} from a toptags response parsed into Picard's XML node tree"""
+    try:
+        lfm = document.lfm[0]
+    except AttributeError:
+        return {}
+    try:
+        intags = lfm.toptags[0].tag
+    except AttributeError:
+        intags = []
+        try:
+            error = lfm.error[0]
+        except AttributeError:
+            pass
+        else:
+            raise LastfmError(_to_count(error.attribs.get("code")), error.text.strip())
+
+    tag_to_count = {}
+    for tag in intags:
+        tag_to_count[tag.name[0].text.strip()] = _to_count(tag.count[0].text)
+    return tag_to_count
+
+
+def parse_toptags_xml_stream(data, limit=None, min_count=None, chunk_size=4096):
+    """Extracts {name: count} from the raw bytes of a toptags XML response.
+
+    The response is fed to an incremental parser in chunks and every ``<tag>`` element is dropped as soon as
+    its name and count are read. Last.fm lists tags by descending count, so parsing stops once ``limit`` tags
+    have been read, or at the first tag counted less than ``min_count``.
+    """
+    parser = XMLPullParser(events=("end",))
+    tag_to_count = {}
+    try:
+        for offset in range(0, len(data), chunk_size):
+            parser.feed(data[offset:offset + chunk_size])
+            for event, elem in parser.read_events():
+                if elem.tag == "tag":
+                    name = elem.findtext("name")
+                    if name is not None:
+                        count = _to_count(elem.findtext("count"))
+                        if min_count is not None and count < min_count:
+                            return tag_to_count
+                        tag_to_count[name.strip()] = count
+                    elem.clear()
+                    if limit and len(tag_to_count) >= limit:
+                        return tag_to_count
+                elif elem.tag == "error":
+                    raise LastfmError(_to_count(elem.get("code")), (elem.text or "").strip())
+    except ParseError:
+        # Truncated or broken response, keep what could be read
+        pass
+    return tag_to_count
+
+
+def parse_toptags_json(data, limit=None, min_count=None):
+    """Extracts {name: count} from the raw bytes of a toptags response requested with ``format=json``.
+
+    Like parse_toptags_xml_stream, stops after ``limit`` tags or at the first one counted less than
+    ``min_count``.
+    """
+    try:
+        document = json.loads(bytes(data).decode("utf-8"))
+    except ValueError:
+        return {}
+    if not isinstance(document, dict):
+        return {}
+    if "error" in document:
+        raise LastfmError(_to_count(str(document["error"])), document.get("message", ""))
+
+    intags = (document.get("toptags") or {}).get("tag") or []
+    if isinstance(intags, dict):
+        # A single tag is not wrapped in a list
+        intags = [intags]
+    if limit:
+        intags = intags[:limit]
+
+    tag_to_count = {}
+    for tag in intags:
+        name = tag.get("name")
+        if name is not None:
+            count = _to_count(str(tag.get("count", 0)))
+            if min_count is not None and count < min_count:
+                break
+            tag_to_count[name.strip()] = count
+    return tag_to_count
+
+
+def parse_toptags_raw(data, limit=None, min_count=None):
+    """Extracts {name: count} from the raw bytes of a toptags response, either JSON or XML"""
+    if data[:64].lstrip()[:1] == b"{":
+        return parse_toptags_json(data, limit, min_count)
+    return parse_toptags_xml_stream(data, limit, min_count)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+import random
+import time
+
+
+class TokenBucket(object):
+    """Paces requests to an average rate while allowing short bursts.
+
+    The bucket holds up to ``capacity`` tokens and refills at ``rate`` tokens per second. Every request takes
+    a token; once the bucket is empty, requests are spaced out at the refill rate. The rate adapts to the
+    server: throttled() halves it (down to ``min_rate``) and drains the bucket, and every succeeded() call
+    wins ``recovery`` requests per second back until the configured rate is reached again.
+    """
+
+    def __init__(self, rate, capacity, min_rate=0.5, recovery=0.02, throttle_window=2.0, clock=time.monotonic):
+        self._clock = clock
+        self.min_rate = min_rate
+        self.recovery = recovery
+        self.throttle_window = throttle_window
+        self.nominal_rate = self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = self.capacity
+        self._updated = clock()
+        self._last_throttle = None
+
+    def configure(self, rate, capacity):
+        self._refill()
+        self.nominal_rate = float(rate)
+        self.rate = min(self.rate, self.nominal_rate)
+        self.capacity = float(capacity)
+        self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return now
+
+    def reserve(self):
+        """Takes a token and returns the seconds to wait before sending the request (0 to send it now).
+
+        Tokens may be taken ahead of time; the bucket then goes negative and each later request waits
+        for the refill of all reservations before it.
+        """
+        self._refill()
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def acquire(self):
+        """Takes a token if one is available and returns 0, otherwise returns the seconds until one is.
+
+        Unlike reserve(), nothing is taken ahead of time: a request waiting for its token is paced at the rate
+        of the moment it gets it, so throttled() slows down the requests already waiting as well.
+        """
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def throttled(self):
+        """Backs off after the server refused a request for exceeding its rate limit.
+
+        Returns False if the refusal was ignored, because the bucket already backed off for a refusal within
+        ``throttle_window`` seconds (the requests in flight at that time are refused together).
+        """
+        now = self._refill()
+        if self._last_throttle is not None and now - self._last_throttle < self.throttle_window:
+            return False
+        self._last_throttle = now
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0.0)
+        return True
+
+    def succeeded(self):
+        if self.rate < self.nominal_rate:
+            self._refill()
+            self.rate = min(self.nominal_rate, self.rate + self.recovery)
+
+
+def backoff_delay(attempt, base, cap, rand=random.random):
+    """Seconds to wait before retrying after ``attempt`` failed attempts.
+
+    The delay doubles with every attempt up to ``cap``, and a random half of it is dropped, so requests which
+    failed together are not all retried at the same moment.
+    """
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay / 2 + rand() * delay / 2
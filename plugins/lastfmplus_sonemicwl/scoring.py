@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+from array import array
+
+# Source types of a candidate tag, as set by apply_translations_and_sally
+TRACK_TAG = 0
+SALLY_TAG = 1
+ARTIST_TAG = 2
+
+
+class TagTable(object):
+    """A track's candidate tags stored as parallel arrays.
+
+    Columns are the tag id, the weight, the source type and the filter group id (index into
+    the group list, -1 if the tag is in no filter list).
+    """
+
+    def __init__(self, tags, classify, groups):
+        group_ids = {group: index for index, group in enumerate(groups)}
+        self.name_id = array('i')
+        self.weight = array('d')
+        self.stype = array('b')
+        self.group = array('b')
+        for tag_id, (weight, stype) in tags:
+            self.name_id.append(tag_id)
+            self.weight.append(weight)
+            self.stype.append(stype)
+            group = classify(tag_id)
+            self.group.append(-1 if group is None else group_ids[group])
+
+    def __len__(self):
+        return len(self.weight)
+
+    def order(self):
+        """Row indices by descending weight; rows of equal weight keep their input order"""
+        return sorted(range(len(self.weight)), key=self.weight.__getitem__, reverse=True)
+
+
+def score_tags(tags, classify, title, info, cfg, on_insert=None):
+    """Selects the tags to write per filter group, like the loop in _tags_finalize, on a TagTable.
+
+    ``tags`` is a list of (tag id, [weight, source type]), ``classify`` and ``title`` map a tag id to its
+    filter group and its display name. ``info`` maps group names (in search order) to the usage list of
+    _tags_finalize. ``on_insert`` is called with (group, name, weight) for every track tag taken into a
+    group. Returns a dict of "<group>/tags" lists with title-cased names.
+
+    The passes are plain Python loops over the array columns, as Picard ships without numpy.
+    """
+    groups = list(info)
+    table = TagTable(tags, classify, groups)
+    order = table.order()
+    n = len(order)
+    weight = table.weight
+    stype = table.stype
+
+    # Weight drop relative to the previous kept tag of the same kind (sally or not) is a running scan
+    max_drop = (cfg["lastfm_max_tracktag_drop"], cfg["lastfm_max_artisttag_drop"])
+    min_weight = (cfg["lastfm_min_tracktag_weight"], cfg["lastfm_min_artisttag_weight"])
+    last = [0, 0]
+    dropped = array('b', bytes(n))
+    below = array('b', bytes(n))
+    for pos, row in enumerate(order):
+        s = stype[row] == SALLY_TAG
+        w = weight[row]
+        if not last[s] or (last[s] - w) < max_drop[s]:
+            last[s] = w
+        else:
+            dropped[pos] = 1
+        below[pos] = w < min_weight[s]
+
+    # Per group usage flags as columns: use sally, use track, use artist, use drop, use min weight, max tags
+    use_sally = [info[group][0] for group in groups]
+    use_track = [info[group][1] for group in groups]
+    use_artist = [info[group][2] for group in groups]
+    use_drop = [info[group][3] for group in groups]
+    use_min = [info[group][4] for group in groups]
+    max_tags = [info[group][5] for group in groups]
+
+    # Ordered dicts stand in for the tag and sally lists: removing and re-inserting moves a tag to the end
+    selected = [None] * len(groups)
+    sally = [None] * len(groups)
+    group_col = table.group
+    name_col = table.name_id
+    for pos, row in enumerate(order):
+        g = group_col[row]
+        if g < 0:
+            continue
+        st = stype[row]
+        s = st == SALLY_TAG
+        arttag = st != TRACK_TAG
+        if ((below[pos] and use_min[g]) or (dropped[pos] and use_drop[g]) or (s and not use_sally[g])
+                or (arttag and not use_artist[g]) or (not arttag and not use_track[g])):
+            continue
+        nid = name_col[row]
+        if selected[g] is None:
+            selected[g] = {}
+            sally[g] = {}
+        group_tags = selected[g]
+        group_sally = sally[g]
+        if not s and nid in group_sally:
+            del group_sally[nid]
+            del group_tags[nid]
+        if nid not in group_tags:
+            if s:
+                group_sally[nid] = None
+            elif not arttag and on_insert is not None:
+                on_insert(groups[g], title(nid), weight[row])
+            group_tags[nid] = None
+
+    # Cut to wanted size, removing sally tags first
+    hold = {}
+    for g, group_tags in enumerate(selected):
+        if group_tags is None:
+            continue
+        group_sally = sally[g]
+        while len(group_tags) > max_tags[g]:
+            if group_sally:
+                del group_tags[group_sally.popitem()[0]]
+            else:
+                group_tags.popitem()
+        hold[groups[g] + "/tags"] = [title(nid) for nid in group_tags]
+    return hold
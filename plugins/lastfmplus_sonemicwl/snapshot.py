@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import re
+import zlib
+
+from .filterset import FilterSet
+from .normalise import TranslationTable
+from .tagfilter import TagClassifier
+
+# A snapshot is a header line "<magic> <version>" followed by the zlib compressed JSON of the compiled set
+SNAPSHOT_MAGIC = b"LASTFMPLUS-FILTERS"
+SNAPSHOT_VERSION = 2
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def save_snapshot(filters, path):
+    """Writes the compiled filter set to ``path``, replacing the file atomically"""
+    payload = {
+        "sources": filters.sources,
+        "groups": filters.groups,
+        "classifier": filters.classifier.state(),
+        "translate": filters.translate.state(),
+    }
+    data = b"%s %d\n" % (SNAPSHOT_MAGIC, SNAPSHOT_VERSION)
+    data += zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), 9)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def load_snapshot(path):
+    """Reads a filter set written by save_snapshot() in one read, without parsing or folding the terms again"""
+    with open(path, "rb") as f:
+        data = f.read()
+    header, _, body = data.partition(b"\n")
+    magic, _, version = header.partition(b" ")
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError("%s is not a Last.fm.Plus filter snapshot" % path)
+    if version != str(SNAPSHOT_VERSION).encode("ascii"):
+        raise SnapshotError("%s has unsupported snapshot version %s" % (path, version.decode("ascii", "replace")))
+    try:
+        payload = json.loads(zlib.decompress(body).decode("utf-8"))
+        return FilterSet(payload["sources"], payload["groups"], TranslationTable.from_state(payload["translate"]),
+                         TagClassifier.from_state(payload["classifier"]))
+    except (zlib.error, re.error, ValueError, KeyError, TypeError) as e:
+        raise SnapshotError("%s is damaged: %s" % (path, e))
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+# Stages of a lookup, in pipeline order:
+#   enqueue   waiting for the rate limiter or a retry back-off before the request is handed to Picard
+#   network   from handing the request to Picard's webservice until the response arrives (includes its queue,
+#             and with the default parser Picard's parsing of the XML document)
+#   parse     extracting the tags from the response
+#   finalize  translating, selecting and writing the tags of a track
+STAGES = ("enqueue", "network", "parse", "finalize")
+COUNTERS = ("cache_hits", "cache_misses", "coalesced", "requests", "retries", "failures")
+
+
+class StageTiming(object):
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class PipelineStats(object):
+    """Counts and times the stages of the tag lookups.
+
+    Recording a timing or a count is a few attribute updates, cheap enough to stay on all the time.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.reset()
+
+    def reset(self):
+        self.started = self.clock()
+        self.timings = {stage: StageTiming() for stage in STAGES}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        # Number of records when the last summary was made, to skip summaries of idle periods
+        self._summarised = 0
+        self._records = 0
+
+    def add_time(self, stage, seconds):
+        self.timings[stage].add(seconds)
+        self._records += 1
+
+    def count(self, counter, n=1):
+        self.counters[counter] += n
+        self._records += 1
+
+    def as_dict(self):
+        """Returns the statistics as plain (JSON serialisable) data"""
+        lookups = self.counters["cache_hits"] + self.counters["cache_misses"] + self.counters["coalesced"]
+        return {
+            "seconds": round(self.clock() - self.started, 3),
+            "counters": dict(self.counters),
+            "cache_hit_ratio": round(float(self.counters["cache_hits"]) / lookups, 3) if lookups else 0.0,
+            "stages": {stage: self.timings[stage].as_dict() for stage in STAGES},
+        }
+
+    def changed(self):
+        """Tells if anything was recorded since the last summary()"""
+        return self._records != self._summarised
+
+    def summary(self):
+        """Returns a one line summary for the log"""
+        self._summarised = self._records
+        counters = self.counters
+        parts = ["%d cache hits, %d misses, %d coalesced, %d requests (%d retries, %d failures)" % (
+            counters["cache_hits"], counters["cache_misses"], counters["coalesced"], counters["requests"],
+            counters["retries"], counters["failures"])]
+        for stage in STAGES:
+            timing = self.timings[stage]
+            if timing.count:
+                parts.append("%s %.1f ms mean / %.1f ms max" % (stage, timing.total * 1000 / timing.count,
+                                                                timing.max * 1000))
+        return ", ".join(parts)
+
+
+def format_stats(stats):
+    """Formats a dict of PipelineStats.as_dict() (plus any extra top level values) as text lines"""
+    lines = ["Since %d s ago:" % stats["seconds"]]
+    counters = stats["counters"]
+    lines.append("Lookups: %d cache hits, %d misses, %d coalesced (hit ratio %.0f%%)" % (
+        counters["cache_hits"], counters["cache_misses"], counters["coalesced"], stats["cache_hit_ratio"] * 100))
+    lines.append("Requests: %d sent, %d retries, %d failures" % (
+        counters["requests"], counters["retries"], counters["failures"]))
+    for stage in STAGES:
+        timing = stats["stages"][stage]
+        lines.append("%-9s %6d x %9.1f ms mean %9.1f ms max %11.1f ms total" % (
+            stage, timing["count"], timing["mean_ms"], timing["max_ms"], timing["total_ms"]))
+    for key in sorted(set(stats) - {"seconds", "counters", "cache_hit_ratio", "stages"}):
+        lines.append("%s: %s" % (key.replace("_", " ").capitalize(), stats[key]))
+    return "\n".join(lines)
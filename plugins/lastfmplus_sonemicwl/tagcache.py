@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DAY = 24 * 60 * 60
+
+
+def make_cachetag(method, artist, track=None):
+    """Builds the key a Last.fm response is cached under (method, artist and optionally track title)"""
+    if track:
+        return "\t".join((method, artist, track))
+    return "\t".join((method, artist))
+
+
+class LRUDict(OrderedDict):
+    """Dict holding at most ``maxlen`` entries, evicting the least recently used one"""
+
+    def __init__(self, maxlen):
+        super(LRUDict, self).__init__()
+        self.maxlen = maxlen
+
+    def __getitem__(self, key):
+        value = super(LRUDict, self).__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, value):
+        super(LRUDict, self).__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxlen:
+            self.popitem(last=False)
+
+
+class TagCache(object):
+    """Two tier cache for Last.fm tag responses.
+
+    A small in-memory LRU sits in front of an SQLite database which survives Picard restarts.
+    Every entry carries its own expiry time; the database is capped at ``max_entries`` rows,
+    dropping the least recently used ones first. Without a database path only the memory
+    tier is used. ``encode`` and ``decode`` convert values between their in-memory and their
+    JSON stored form.
+    """
+
+    SCHEMA = ("CREATE TABLE IF NOT EXISTS tags ("
+              "key TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)")
+    # How many writes may happen between two checks of the size cap
+    EVICT_INTERVAL = 100
+
+    def __init__(self, path=None, ttl=30 * DAY, max_entries=50000, memory_entries=2000, on_error=None,
+                 encode=None, decode=None):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.on_error = on_error
+        self.encode = encode
+        self.decode = decode
+        self._memory = LRUDict(memory_entries)
+        self._lock = threading.RLock()
+        self._db = None
+        self._writes = 0
+        if path:
+            self.open(path)
+
+    def open(self, path):
+        with self._lock:
+            self.close()
+            self.path = path
+            try:
+                directory = os.path.dirname(path)
+                if directory and not os.path.isdir(directory):
+                    os.makedirs(directory)
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("PRAGMA synchronous=NORMAL")
+                self._db.execute(self.SCHEMA)
+                self._db.commit()
+            except (OSError, sqlite3.Error) as e:
+                self._failed(e)
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                try:
+                    self._db.close()
+                except sqlite3.Error:
+                    pass
+                self._db = None
+
+    def configure(self, ttl, max_entries):
+        with self._lock:
+            self.ttl = ttl
+            self.max_entries = max_entries
+
+    @property
+    def persistent(self):
+        return self._db is not None
+
+    def _failed(self, error):
+        # Keep going with the memory tier only rather than breaking tagging
+        self.close()
+        if self.on_error:
+            self.on_error(error)
+
+    def get(self, key):
+        """Returns the cached value for ``key``, or None if it is missing or expired"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    return entry[1]
+                del self._memory[key]
+            if self._db is None:
+                return None
+            try:
+                row = self._db.execute("SELECT data, expires FROM tags WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if row[1] <= now:
+                    self._db.execute("DELETE FROM tags WHERE key = ?", (key,))
+                    self._db.commit()
+                    return None
+                self._db.execute("UPDATE tags SET accessed = ? WHERE key = ?", (now, key))
+                self._db.commit()
+                value = json.loads(row[0])
+                if self.decode is not None:
+                    value = self.decode(value)
+            except (sqlite3.Error, ValueError) as e:
+                self._failed(e)
+                return None
+            self._memory[key] = (row[1], value)
+            return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def put(self, key, value, ttl=None, persist=True):
+        """Stores ``value`` (JSON serialisable once encoded) for ``ttl`` seconds, defaulting to the cache TTL.
+
+        With ``persist`` unset the value is only kept in the memory tier.
+        """
+        now = time.time()
+        expires = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._memory[key] = (expires, value)
+            if self._db is None or not persist:
+                return
+            if self.encode is not None:
+                value = self.encode(value)
+            try:
+                self._db.execute("INSERT OR REPLACE INTO tags (key, data, expires, accessed) VALUES (?, ?, ?, ?)",
+                                 (key, json.dumps(value, ensure_ascii=False), expires, now))
+                self._writes += 1
+                if self._writes >= self.EVICT_INTERVAL:
+                    self._writes = 0
+                    self._evict(now)
+                self._db.commit()
+            except sqlite3.Error as e:
+                self._failed(e)
+
+    def _evict(self, now):
+        self._db.execute("DELETE FROM tags WHERE expires <= ?", (now,))
+        count = self._db.execute("SELECT COUNT(*) FROM tags").fetchone()[0]
+        if count > self.max_entries:
+            self._db.execute("DELETE FROM tags WHERE key IN (SELECT key FROM tags ORDER BY accessed LIMIT ?)",
+                             (count - self.max_entries,))
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM tags")
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    self._failed(e)
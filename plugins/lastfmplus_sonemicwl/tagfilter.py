@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+import re
+
+# Order in which the filter lists are searched; a tag is assigned to the first list it matches
+FILTER_GROUPS = ("major", "minor", "country", "city", "decade", "year", "mood", "occasion", "category")
+
+
+def split_terms(text):
+    """Splits a comma separated option string into stripped, non-empty terms"""
+    return [term.strip() for term in text.split(',') if term.strip()]
+
+
+def split_translations(text):
+    """Splits the translations option string ("source,target" per line) into stripped (source, target) pairs"""
+    pairs = []
+    for line in text.split("\n"):
+        parts = [part.strip() for part in line.split(',')]
+        if len(parts) == 2 and parts[0] and parts[1]:
+            pairs.append((parts[0], parts[1]))
+    return pairs
+
+
+def wildcard_pattern(term):
+    """Converts a wildcard term (``*`` matches anything) into a regular expression"""
+    return re.escape(term).replace(r'\*', '.*?')
+
+
+class GroupMatcher(object):
+    """Precomputed lookup of whether a (lowercased) tag matches the terms of one filter list.
+
+    Exact terms are resolved through a set, wildcard terms through one precompiled alternation. Results are
+    memoised, and a matcher is reused as long as the text of its list does not change.
+    """
+
+    def __init__(self, terms):
+        self.exact = {term for term in terms if '*' not in term}
+        wildcards = [wildcard_pattern(term) for term in terms if '*' in term]
+        self.wildcards = re.compile("|".join(wildcards)) if wildcards else None
+        self._memo = {}
+
+    def state(self):
+        """Returns the compiled lookup as plain data, see from_state()"""
+        return {
+            "exact": sorted(self.exact),
+            "wildcards": self.wildcards.pattern if self.wildcards is not None else None,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Restores a matcher from state() without going through the terms again"""
+        matcher = cls.__new__(cls)
+        matcher.exact = set(state["exact"])
+        matcher.wildcards = re.compile(state["wildcards"]) if state["wildcards"] else None
+        matcher._memo = {}
+        return matcher
+
+    def matches(self, tag):
+        try:
+            return self._memo[tag]
+        except KeyError:
+            pass
+        found = tag in self.exact or (self.wildcards is not None and self.wildcards.match(tag) is not None)
+        self._memo[tag] = found
+        return found
+
+
+class TagClassifier(object):
+    """Precomputed lookup of which filter group a (lowercased) tag belongs to.
+
+    Every group has its own GroupMatcher, asked in search order. Results are memoised as well, so every
+    distinct tag is only classified once; a classifier built after some lists changed takes over the matchers
+    of the other groups, memos included. Tags can be given as names or as ids of a TagVocabulary.
+    """
+
+    def __init__(self, groups, matchers=None):
+        # groups: sequence of (group name, list of terms), in search order; matchers: GroupMatchers by group
+        # name to take over instead of compiling the terms again
+        matchers = matchers or {}
+        self.order = [group for group, terms in groups]
+        self.matchers = {group: matchers[group] if group in matchers else GroupMatcher(terms)
+                         for group, terms in groups}
+        self._search = [(group, self.matchers[group]) for group in self.order]
+        self._memo = {}
+        self._memo_ids = {}
+
+    def state(self):
+        """Returns the compiled lookup as plain data, see from_state()"""
+        return {
+            "order": self.order,
+            "groups": {group: matcher.state() for group, matcher in self.matchers.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Restores a classifier from state() without going through the terms again"""
+        matchers = {group: GroupMatcher.from_state(matcher) for group, matcher in state["groups"].items()}
+        return cls([(group, None) for group in state["order"]], matchers)
+
+    def classify(self, tag):
+        """Returns the name of the first filter group matching ``tag``, or None"""
+        try:
+            return self._memo[tag]
+        except KeyError:
+            pass
+        group = None
+        for name, matcher in self._search:
+            if matcher.matches(tag):
+                group = name
+                break
+        self._memo[tag] = group
+        return group
+
+    def classify_id(self, tag_id, vocabulary):
+        """Returns the name of the first filter group matching the tag with id ``tag_id``, or None"""
+        try:
+            return self._memo_ids[tag_id]
+        except KeyError:
+            group = self._memo_ids[tag_id] = self.classify(vocabulary.names[tag_id])
+            return group
+
+
+def find_conflicts(groups, classifier=None):
+    """Yields the terms of the filter lists which can never decide the group of a tag.
+
+    ``groups`` is a sequence of (group name, list of terms) in search order, ``classifier`` the TagClassifier
+    compiled from them (built if not given). Yields (term, group, other group, wildcard) tuples in list order:
+    with ``wildcard`` None, ``term`` was already listed in the other group (which may be the same one);
+    otherwise it is matched by the ``wildcard`` term of the other group, which is searched first or is the
+    same group. The terms are gone through in one pass, matching each against the compiled wildcards of the
+    groups up to its own.
+    """
+    if classifier is None:
+        classifier = TagClassifier(groups)
+    wildcards = {group: [term for term in terms if '*' in term] for group, terms in groups}
+    searched = {group: classifier.order[:index + 1] for index, group in enumerate(classifier.order)}
+    first = {}
+    for group, terms in groups:
+        for term in terms:
+            if term in first:
+                yield term, group, first[term], None
+                continue
+            first[term] = group
+            if '*' in term:
+                continue
+            for other in searched[group]:
+                compiled = classifier.matchers[other].wildcards
+                if compiled is not None and compiled.match(term):
+                    wildcard = next(wildcard for wildcard in wildcards[other]
+                                    if re.match(wildcard_pattern(wildcard), term))
+                    yield term, group, other, wildcard
+                    break
@@ -258,6 +258,12 @@ class UiLastfmOptionsPage(object):
         self.load_default_lists.setObjectName("load_default_lists")
         self.verticalLayout.addWidget(self.load_default_lists)
         self.gridlayout_tab_tag_filter_list.addWidget(self.groupbox_tools, 1, 1, 1, 1)
+        self.word_list_issues = QtWidgets.QPlainTextEdit(self.tab_tag_filter_lists)
+        self.word_list_issues.setReadOnly(True)
+        self.word_list_issues.setMaximumHeight(120)
+        self.word_list_issues.setObjectName("word_list_issues")
+        self.word_list_issues.hide()
+        self.gridlayout_tab_tag_filter_list.addWidget(self.word_list_issues, 2, 0, 1, 2)
         self.tabWidget.addTab(self.tab_tag_filter_lists, "")
         self.horizontalLayout.addWidget(self.tabWidget)
 
@@ -278,6 +284,172 @@ class UiLastfmOptionsPage(object):
 
         self.gridlayout_tag_general_options.addWidget(self.groupbox_api_key)
 
+        self.tab_advanced = QtWidgets.QWidget()
+        self.tab_advanced.setObjectName("tab_advanced")
+        self.gridlayout_tab_advanced = QtWidgets.QGridLayout(self.tab_advanced)
+        self.gridlayout_tab_advanced.setObjectName("gridlayout_tab_advanced")
+
+        self.groupbox_cache = QtWidgets.QGroupBox(self.tab_advanced)
+        self.groupbox_cache.setObjectName("groupbox_cache")
+        self.gridlayout_cache = QtWidgets.QGridLayout(self.groupbox_cache)
+        self.gridlayout_cache.setObjectName("gridlayout_cache")
+
+        self.persistent_cache = QtWidgets.QCheckBox(self.groupbox_cache)
+        self.persistent_cache.setObjectName("persistent_cache")
+        self.gridlayout_cache.addWidget(self.persistent_cache, 0, 0, 1, 2)
+
+        self.label_cache_ttl_days = QtWidgets.QLabel(self.groupbox_cache)
+        self.label_cache_ttl_days.setObjectName("label_cache_ttl_days")
+        self.gridlayout_cache.addWidget(self.label_cache_ttl_days, 1, 0, 1, 1)
+        self.cache_ttl_days = QtWidgets.QSpinBox(self.groupbox_cache)
+        self.cache_ttl_days.setMinimum(1)
+        self.cache_ttl_days.setMaximum(3650)
+        self.cache_ttl_days.setObjectName("cache_ttl_days")
+        self.gridlayout_cache.addWidget(self.cache_ttl_days, 1, 1, 1, 1)
+
+        self.label_cache_max_entries = QtWidgets.QLabel(self.groupbox_cache)
+        self.label_cache_max_entries.setObjectName("label_cache_max_entries")
+        self.gridlayout_cache.addWidget(self.label_cache_max_entries, 2, 0, 1, 1)
+        self.cache_max_entries = QtWidgets.QSpinBox(self.groupbox_cache)
+        self.cache_max_entries.setMinimum(100)
+        self.cache_max_entries.setMaximum(10000000)
+        self.cache_max_entries.setSingleStep(1000)
+        self.cache_max_entries.setObjectName("cache_max_entries")
+        self.gridlayout_cache.addWidget(self.cache_max_entries, 2, 1, 1, 1)
+
+        self.label_negative_cache_days = QtWidgets.QLabel(self.groupbox_cache)
+        self.label_negative_cache_days.setObjectName("label_negative_cache_days")
+        self.gridlayout_cache.addWidget(self.label_negative_cache_days, 3, 0, 1, 1)
+        self.negative_cache_days = QtWidgets.QSpinBox(self.groupbox_cache)
+        self.negative_cache_days.setMinimum(0)
+        self.negative_cache_days.setMaximum(365)
+        self.negative_cache_days.setObjectName("negative_cache_days")
+        self.gridlayout_cache.addWidget(self.negative_cache_days, 3, 1, 1, 1)
+
+        self.gridlayout_tab_advanced.addWidget(self.groupbox_cache, 0, 0, 1, 1)
+
+        self.groupbox_requests = QtWidgets.QGroupBox(self.tab_advanced)
+        self.groupbox_requests.setObjectName("groupbox_requests")
+        self.gridlayout_requests = QtWidgets.QGridLayout(self.groupbox_requests)
+        self.gridlayout_requests.setObjectName("gridlayout_requests")
+
+        self.prefetch_album_tags = QtWidgets.QCheckBox(self.groupbox_requests)
+        self.prefetch_album_tags.setObjectName("prefetch_album_tags")
+        self.gridlayout_requests.addWidget(self.prefetch_album_tags, 0, 0, 1, 2)
+
+        self.album_consensus = QtWidgets.QCheckBox(self.groupbox_requests)
+        self.album_consensus.setObjectName("album_consensus")
+        self.gridlayout_requests.addWidget(self.album_consensus, 1, 0, 1, 2)
+
+        self.label_consensus_sample_tracks = QtWidgets.QLabel(self.groupbox_requests)
+        self.label_consensus_sample_tracks.setObjectName("label_consensus_sample_tracks")
+        self.gridlayout_requests.addWidget(self.label_consensus_sample_tracks, 2, 0, 1, 1)
+        self.consensus_sample_tracks = QtWidgets.QSpinBox(self.groupbox_requests)
+        self.consensus_sample_tracks.setMinimum(0)
+        self.consensus_sample_tracks.setMaximum(999)
+        self.consensus_sample_tracks.setObjectName("consensus_sample_tracks")
+        self.gridlayout_requests.addWidget(self.consensus_sample_tracks, 2, 1, 1, 1)
+
+        self.adaptive_rate = QtWidgets.QCheckBox(self.groupbox_requests)
+        self.adaptive_rate.setObjectName("adaptive_rate")
+        self.gridlayout_requests.addWidget(self.adaptive_rate, 3, 0, 1, 2)
+
+        self.label_rate_burst = QtWidgets.QLabel(self.groupbox_requests)
+        self.label_rate_burst.setObjectName("label_rate_burst")
+        self.gridlayout_requests.addWidget(self.label_rate_burst, 4, 0, 1, 1)
+        self.rate_burst = QtWidgets.QSpinBox(self.groupbox_requests)
+        self.rate_burst.setMinimum(1)
+        self.rate_burst.setMaximum(300)
+        self.rate_burst.setObjectName("rate_burst")
+        self.gridlayout_requests.addWidget(self.rate_burst, 4, 1, 1, 1)
+
+        self.normalise_titles = QtWidgets.QCheckBox(self.groupbox_requests)
+        self.normalise_titles.setObjectName("normalise_titles")
+        self.gridlayout_requests.addWidget(self.normalise_titles, 5, 0, 1, 2)
+
+        self.label_title_suffixes = QtWidgets.QLabel(self.groupbox_requests)
+        self.label_title_suffixes.setObjectName("label_title_suffixes")
+        self.gridlayout_requests.addWidget(self.label_title_suffixes, 6, 0, 1, 1)
+        self.title_suffixes = QtWidgets.QLineEdit(self.groupbox_requests)
+        self.title_suffixes.setObjectName("title_suffixes")
+        self.gridlayout_requests.addWidget(self.title_suffixes, 6, 1, 1, 1)
+
+        self.gridlayout_tab_advanced.addWidget(self.groupbox_requests, 1, 0, 1, 1)
+
+        self.groupbox_processing = QtWidgets.QGroupBox(self.tab_advanced)
+        self.groupbox_processing.setObjectName("groupbox_processing")
+        self.gridlayout_processing = QtWidgets.QGridLayout(self.groupbox_processing)
+        self.gridlayout_processing.setObjectName("gridlayout_processing")
+
+        self.array_scoring = QtWidgets.QCheckBox(self.groupbox_processing)
+        self.array_scoring.setObjectName("array_scoring")
+        self.gridlayout_processing.addWidget(self.array_scoring, 0, 0, 1, 2)
+
+        self.label_response_parser = QtWidgets.QLabel(self.groupbox_processing)
+        self.label_response_parser.setObjectName("label_response_parser")
+        self.gridlayout_processing.addWidget(self.label_response_parser, 1, 0, 1, 1)
+        self.response_parser = QtWidgets.QComboBox(self.groupbox_processing)
+        self.response_parser.addItem("", "xml")
+        self.response_parser.addItem("", "xml-stream")
+        self.response_parser.addItem("", "json")
+        self.response_parser.setObjectName("response_parser")
+        self.gridlayout_processing.addWidget(self.response_parser, 1, 1, 1, 1)
+
+        self.label_max_parsed_tags = QtWidgets.QLabel(self.groupbox_processing)
+        self.label_max_parsed_tags.setObjectName("label_max_parsed_tags")
+        self.gridlayout_processing.addWidget(self.label_max_parsed_tags, 2, 0, 1, 1)
+        self.max_parsed_tags = QtWidgets.QSpinBox(self.groupbox_processing)
+        self.max_parsed_tags.setMinimum(1)
+        self.max_parsed_tags.setMaximum(1000)
+        self.max_parsed_tags.setObjectName("max_parsed_tags")
+        self.gridlayout_processing.addWidget(self.max_parsed_tags, 2, 1, 1, 1)
+
+        self.gridlayout_tab_advanced.addWidget(self.groupbox_processing, 2, 0, 1, 1)
+
+        self.groupbox_snapshot = QtWidgets.QGroupBox(self.tab_advanced)
+        self.groupbox_snapshot.setObjectName("groupbox_snapshot")
+        self.gridlayout_snapshot = QtWidgets.QGridLayout(self.groupbox_snapshot)
+        self.gridlayout_snapshot.setObjectName("gridlayout_snapshot")
+
+        self.label_filter_snapshot = QtWidgets.QLabel(self.groupbox_snapshot)
+        self.label_filter_snapshot.setObjectName("label_filter_snapshot")
+        self.gridlayout_snapshot.addWidget(self.label_filter_snapshot, 0, 0, 1, 1)
+        self.filter_snapshot = QtWidgets.QLineEdit(self.groupbox_snapshot)
+        self.filter_snapshot.setObjectName("filter_snapshot")
+        self.gridlayout_snapshot.addWidget(self.filter_snapshot, 0, 1, 1, 1)
+        self.browse_filter_snapshot = QtWidgets.QPushButton(self.groupbox_snapshot)
+        self.browse_filter_snapshot.setObjectName("browse_filter_snapshot")
+        self.gridlayout_snapshot.addWidget(self.browse_filter_snapshot, 0, 2, 1, 1)
+
+        self.export_filter_snapshot = QtWidgets.QPushButton(self.groupbox_snapshot)
+        self.export_filter_snapshot.setObjectName("export_filter_snapshot")
+        self.gridlayout_snapshot.addWidget(self.export_filter_snapshot, 1, 2, 1, 1)
+
+        self.gridlayout_tab_advanced.addWidget(self.groupbox_snapshot, 3, 0, 1, 1)
+
+        self.groupbox_statistics = QtWidgets.QGroupBox(self.tab_advanced)
+        self.groupbox_statistics.setObjectName("groupbox_statistics")
+        self.gridlayout_statistics = QtWidgets.QGridLayout(self.groupbox_statistics)
+        self.gridlayout_statistics.setObjectName("gridlayout_statistics")
+
+        self.statistics = QtWidgets.QPlainTextEdit(self.groupbox_statistics)
+        self.statistics.setReadOnly(True)
+        self.statistics.setMinimumHeight(140)
+        self.statistics.setObjectName("statistics")
+        self.gridlayout_statistics.addWidget(self.statistics, 0, 0, 3, 1)
+        self.refresh_statistics = QtWidgets.QPushButton(self.groupbox_statistics)
+        self.refresh_statistics.setObjectName("refresh_statistics")
+        self.gridlayout_statistics.addWidget(self.refresh_statistics, 0, 1, 1, 1)
+        self.reset_statistics = QtWidgets.QPushButton(self.groupbox_statistics)
+        self.reset_statistics.setObjectName("reset_statistics")
+        self.gridlayout_statistics.addWidget(self.reset_statistics, 1, 1, 1, 1)
+
+        self.gridlayout_tab_advanced.addWidget(self.groupbox_statistics, 4, 0, 1, 1)
+        spacer_advanced = QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Minimum,
+                                                QtWidgets.QSizePolicy.Expanding)
+        self.gridlayout_tab_advanced.addItem(spacer_advanced, 99, 0, 1, 1)
+        self.tabWidget.addTab(self.tab_advanced, "")
+
         self.retranslateUi(lastfm_options_page)
         self.tabWidget.setCurrentIndex(0)
         QtCore.QMetaObject.connectSlotsByName(lastfm_options_page)
@@ -1873,3 +2045,95 @@ class UiLastfmOptionsPage(object):
                                            "href=\"https://www.last.fm/api/account/create\">Last.fm API account</a>, "
                                            "and paste the API key here.</p></body></html>",
                                            None))
+
+        self.tabWidget.setTabText(self.tabWidget.indexOf(self.tab_advanced),
+                                  _translate("lastfm_options_page", "Advanced", None))
+        self.groupbox_cache.setTitle(_translate("lastfm_options_page", "Tag Cache", None))
+        self.persistent_cache.setText(_translate("lastfm_options_page", "Keep downloaded tags across sessions",
+                                                 None))
+        self.persistent_cache.setToolTip(_translate("lastfm_options_page",
+                                                    "Store Last.fm responses on disk, so re-tagging releases "
+                                                    "does not request them again after a restart.", None))
+        self.label_cache_ttl_days.setText(_translate("lastfm_options_page", "Keep tags for (days)", None))
+        self.label_cache_max_entries.setText(_translate("lastfm_options_page", "Maximum cached responses", None))
+        self.cache_max_entries.setToolTip(_translate("lastfm_options_page",
+                                                     "Least recently used responses are dropped once the cache "
+                                                     "grows beyond this size.", None))
+        self.label_negative_cache_days.setText(_translate("lastfm_options_page",
+                                                          "Keep lookups without tags for (days)", None))
+        self.negative_cache_days.setToolTip(_translate("lastfm_options_page",
+                                                       "Artists and tracks Last.fm has no tags for, or does not "
+                                                       "know, are asked again after this time. Failed requests "
+                                                       "are retried and never cached.", None))
+        self.groupbox_requests.setTitle(_translate("lastfm_options_page", "Requests", None))
+        self.prefetch_album_tags.setText(_translate("lastfm_options_page",
+                                                    "Request tags for the whole release when it is loaded", None))
+        self.prefetch_album_tags.setToolTip(_translate("lastfm_options_page",
+                                                       "Queue all artist and track lookups of a release at once "
+                                                       "instead of one track after the other.", None))
+        self.album_consensus.setText(_translate("lastfm_options_page", "Album consensus (same genres for every "
+                                                "track of a release)", None))
+        self.album_consensus.setToolTip(_translate("lastfm_options_page",
+                                                   "Compute the tags once per release from the tags of its "
+                                                   "artists and of a sample of its tracks, and write them to "
+                                                   "every track. Needs far fewer track lookups on long "
+                                                   "releases.", None))
+        self.label_consensus_sample_tracks.setText(_translate("lastfm_options_page", "Tracks sampled per release",
+                                                              None))
+        self.consensus_sample_tracks.setToolTip(_translate("lastfm_options_page",
+                                                           "Number of tracks, spread over the release, whose own "
+                                                           "tags are looked up in album consensus mode. With 0 "
+                                                           "only the artist tags are used.", None))
+        self.adaptive_rate.setText(_translate("lastfm_options_page", "Adaptive rate control", None))
+        self.adaptive_rate.setToolTip(_translate("lastfm_options_page",
+                                                 "Allow short bursts of requests while keeping the average at 5 "
+                                                 "requests per second, and slow down when Last.fm reports the "
+                                                 "rate limit as exceeded. When off, requests are sent at most "
+                                                 "every 300 ms.", None))
+        self.label_rate_burst.setText(_translate("lastfm_options_page", "Burst size (requests)", None))
+        self.rate_burst.setToolTip(_translate("lastfm_options_page",
+                                              "Number of requests sent without delay after a pause. Larger bursts "
+                                              "lower the sustained rate, so the 5 minute average is kept.", None))
+        self.normalise_titles.setText(_translate("lastfm_options_page", "Look up versions of a track once", None))
+        self.normalise_titles.setToolTip(_translate("lastfm_options_page",
+                                                    "Look up track tags by the title without version suffixes "
+                                                    "like \"(Remastered 2011)\" or \"(Live)\", ignoring case, so "
+                                                    "the versions of a track share one request.", None))
+        self.label_title_suffixes.setText(_translate("lastfm_options_page", "Version words", None))
+        self.title_suffixes.setToolTip(_translate("lastfm_options_page",
+                                                  "Bracketed or dash separated title endings made of these "
+                                                  "comma separated words (with years, numbers, \"version\" or "
+                                                  "\"edit\") are dropped; * matches the rest of a word.", None))
+        self.groupbox_processing.setTitle(_translate("lastfm_options_page", "Processing", None))
+        self.array_scoring.setText(_translate("lastfm_options_page", "Use array based tag scoring", None))
+        self.array_scoring.setToolTip(_translate("lastfm_options_page",
+                                                 "Select the tags per list with the table based scoring engine, "
+                                                 "which is cheaper for tracks with many tags.", None))
+        self.label_response_parser.setText(_translate("lastfm_options_page", "Response parser", None))
+        self.response_parser.setItemText(0, _translate("lastfm_options_page", "XML (Picard)", None))
+        self.response_parser.setItemText(1, _translate("lastfm_options_page", "XML (streaming)", None))
+        self.response_parser.setItemText(2, _translate("lastfm_options_page", "JSON", None))
+        self.label_max_parsed_tags.setText(_translate("lastfm_options_page", "Tags read per response", None))
+        self.max_parsed_tags.setToolTip(_translate("lastfm_options_page",
+                                                   "The streaming and JSON parsers stop after this many tags, "
+                                                   "or at the first tag below the minimum weight, so such tags "
+                                                   "no longer fill the lists which ignore it (moods, "
+                                                   "occasions, ...). Last.fm lists the most used tags first.",
+                                                   None))
+        self.groupbox_snapshot.setTitle(_translate("lastfm_options_page", "Filter Snapshot", None))
+        self.label_filter_snapshot.setText(_translate("lastfm_options_page", "Shared snapshot", None))
+        self.filter_snapshot.setToolTip(_translate("lastfm_options_page",
+                                                   "When set, the genre lists and translations are loaded from "
+                                                   "this snapshot file instead of the lists in these options.",
+                                                   None))
+        self.browse_filter_snapshot.setText(_translate("lastfm_options_page", "Browse...", None))
+        self.export_filter_snapshot.setText(_translate("lastfm_options_page", "Export saved lists...", None))
+        self.export_filter_snapshot.setToolTip(_translate("lastfm_options_page",
+                                                          "Write the saved genre lists and translations, compiled, "
+                                                          "to a snapshot file.", None))
+        self.groupbox_statistics.setTitle(_translate("lastfm_options_page", "Lookup Statistics", None))
+        self.statistics.setToolTip(_translate("lastfm_options_page",
+                                              "Counts and times of the Last.fm lookups made since Picard started "
+                                              "or the statistics were reset.", None))
+        self.refresh_statistics.setText(_translate("lastfm_options_page", "Refresh", None))
+        self.reset_statistics.setText(_translate("lastfm_options_page", "Reset", None))
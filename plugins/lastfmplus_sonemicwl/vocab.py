@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+
+class TagVocabulary(object):
+    """Interns normalised (stripped, lowercased) tag names as small integer ids.
+
+    Ids are only valid for the lifetime of the process; anything written to disk must use the names.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self.names = []
+        self._titles = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        """Returns the id of ``name``, assigning a new one on first sight"""
+        try:
+            return self._ids[name]
+        except KeyError:
+            pass
+        lowered = name.strip().lower()
+        try:
+            tag_id = self._ids[lowered]
+        except KeyError:
+            tag_id = self._ids[lowered] = len(self.names)
+            self.names.append(lowered)
+            self._titles.append(lowered.title())
+        # Remember the raw spelling as well, so it is only normalised once
+        self._ids[name] = tag_id
+        return tag_id
+
+    def name(self, tag_id):
+        return self.names[tag_id]
+
+    def title(self, tag_id):
+        return self._titles[tag_id]
+
+    def encode(self, tag_to_count):
+        """Converts a {tag id: count} dict into {name: count}"""
+        names = self.names
+        return {names[tag_id]: count for tag_id, count in tag_to_count.items()}
+
+    def decode(self, name_to_count):
+        """Converts a {name: count} dict into {tag id: count}, keeping the highest count of names folding together"""
+        tag_to_count = {}
+        for name, count in name_to_count.items():
+            tag_id = self.intern(name)
+            if count > tag_to_count.get(tag_id, -1):
+                tag_to_count[tag_id] = count
+        return tag_to_count
+
+
+VOCABULARY = TagVocabulary()
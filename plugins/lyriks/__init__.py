@@ -1,7 +1,7 @@
 from functools import partial
 
 from picard import log
-from picard.metadata import register_track_metadata_processor
+from picard.metadata import register_album_metadata_processor, register_track_metadata_processor
 from picard.util import thread
 
 from .deezerapi import DeezerAPI
@@ -14,37 +14,95 @@ PLUGIN_API_VERSIONS = ["2.0", "2.1", "2.2"]
 PLUGIN_LICENSE = "GPL-2.0"
 PLUGIN_LICENSE_URL = "https://www.gnu.org/licenses/gpl-2.0.html"
 
+# Fetch the lyrics of a release in one batch when it loads, resolving its tracks through the Deezer album
+ALBUM_MODE = True
+
 
 class Lyriks:
 
     def __init__(self):
         self.deez_api = DeezerAPI.get_instance()
+        # Lyrics fetched in album mode by album id, then MusicBrainz track id, until the tracks take them
+        self.album_lyrics = {}
+        # The batch in flight by album id; results of a batch replaced by a reload or removal are dropped
+        self.album_batches = {}
+        self.album_removal_connected = False
+
+    def process_album(self, album, album_metadata, release_node):
+        if not ALBUM_MODE:
+            return
+        tracks = {}
+        for medium in release_node.get('media', []):
+            for track in medium.get('tracks', []):
+                isrcs = track.get('recording', {}).get('isrcs')
+                if isrcs:
+                    tracks[track['id']] = isrcs
+        self.album_lyrics.pop(album.id, None)
+        if not tracks:
+            self.album_batches.pop(album.id, None)
+            return
+        if not self.album_removal_connected:
+            album.tagger.album_removed.connect(self.album_removed)
+            self.album_removal_connected = True
+        batch = self.album_batches[album.id] = object()
+        # Picard only loads the tracks once the album has no requests left, so every track finds its lyrics
+        # ready in album_lyrics
+        album._requests += 1
+        self.deez_api.fetch_album_lyrics(release_node.get('barcode'), tracks,
+                                         partial(self.album_lyrics_fetched, album, batch))
+
+    def album_lyrics_fetched(self, album, batch, results):
+        thread.to_main(self.apply_album_lyrics, album, batch, results)
+
+    def apply_album_lyrics(self, album, batch, results):
+        if self.album_batches.get(album.id) is batch:
+            del self.album_batches[album.id]
+            log.debug("%s: lyrics for %d of %d tracks of %s", PLUGIN_NAME,
+                      sum(1 for lyrics in results.values() if lyrics), len(results), album.id)
+            self.album_lyrics[album.id] = results
+        album._requests -= 1
+        album._finalize_loading(None)
+
+    def album_removed(self, album):
+        self.album_lyrics.pop(album.id, None)
+        self.album_batches.pop(album.id, None)
 
     def process_lyrics(self, tagger, track_metadata, track_node, release_node):
-        thread.run_task(
-            partial(self.fetch_lyrics, tagger, track_metadata),
-            partial(self.apply_lyrics, tagger, track_metadata)
-        )
-
-    def fetch_lyrics(self, tagger, track_metadata):
-        if track_metadata:
-            isrcs = track_metadata.getall('isrc')
-            for isrc in isrcs:
-                tagger._requests += 1
-                lyrics = self.deez_api.get_lyrics_isrc(isrc)
+        results = self.album_lyrics.get(tagger.id)
+        if results is not None and track_node.get('id') in results:
+            lyrics = results.pop(track_node['id'])
+            if not results:
+                del self.album_lyrics[tagger.id]
+            if lyrics:
                 track_metadata['lyrics'] = lyrics
-                log.debug("%s: ISRC: %s, lyrics = %s", PLUGIN_NAME, isrc, lyrics)
-                return lyrics
-        return None
+            return
+        isrcs = track_metadata.getall('isrc')
+        if not isrcs:
+            return
+        # The lookups of all tracks share the client's bounded worker pool, so the tracks of an album are
+        # fetched in parallel rather than each in its own serial chain
+        tagger._requests += 1
+        future = self.deez_api.submit(self.deez_api.get_lyrics_isrcs, isrcs)
+        future.add_done_callback(partial(self.lyrics_fetched, tagger, track_metadata))
+
+    def lyrics_fetched(self, tagger, track_metadata, future):
+        # Called in the worker thread, the metadata is only touched on the main thread
+        thread.to_main(self.apply_lyrics, tagger, track_metadata, future)
 
     @staticmethod
-    def apply_lyrics(tagger, track_metadata, result=None, error=None):
-        if error:
-            return
-        else:
-            track_metadata['lyrics'] = result
+    def apply_lyrics(tagger, track_metadata, future):
+        try:
+            lyrics = future.result()
+        except Exception as e:
+            log.error("%s: fetching lyrics failed: %s", PLUGIN_NAME, e)
+            lyrics = None
+        log.debug("%s: ISRC: %s, lyrics = %s", PLUGIN_NAME, track_metadata['isrc'], lyrics)
+        if lyrics:
+            track_metadata['lyrics'] = lyrics
         tagger._requests -= 1
         tagger._finalize_loading(None)
 
 
-register_track_metadata_processor(Lyriks().process_lyrics)
+plugin = Lyriks()
+register_album_metadata_processor(plugin.process_album)
+register_track_metadata_processor(plugin.process_lyrics)
@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from time import time
+
+DAY = 24 * 60 * 60
+# ISRCs rarely move to another Deezer track, lyrics get corrected now and then
+TRACK_ID_TTL = 90 * DAY
+LYRICS_TTL = 30 * DAY
+# Lookups which found nothing are asked again sooner
+MISSING_TTL = 7 * DAY
+
+# Returned by the getters for lookups not in the cache (None is a cached "nothing found")
+MISSING = object()
+
+
+class LyricsCache:
+    """Two level cache of ISRC -> Deezer track id and track id -> parsed lyrics.
+
+    An in-memory LRU of the most recently used entries sits in front of an SQLite database, which keeps the
+    lyrics zlib compressed. Every entry carries its own expiry time. Without a path, or if the database
+    cannot be used, only the memory tier is kept. Safe to share between threads.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS track_ids (isrc TEXT PRIMARY KEY, sng_id TEXT, expires REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS lyrics (sng_id TEXT PRIMARY KEY, body BLOB, expires REAL NOT NULL)",
+    )
+
+    def __init__(self, path=None, memory_entries=2000):
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self._db = None
+        if path:
+            self.open(path)
+
+    def open(self, path):
+        with self._lock:
+            self.close()
+            try:
+                directory = os.path.dirname(path)
+                if directory and not os.path.isdir(directory):
+                    os.makedirs(directory)
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                for statement in self.SCHEMA:
+                    self._db.execute(statement)
+                self._db.commit()
+            except (OSError, sqlite3.Error):
+                self.close()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                try:
+                    self._db.close()
+                except sqlite3.Error:
+                    pass
+                self._db = None
+
+    def _remember(self, key, expires, value):
+        self._memory[key] = (expires, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _get(self, key, query, decode):
+        now = time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > now:
+                self._memory.move_to_end(key)
+                return entry[1]
+            if self._db is None:
+                return MISSING
+            try:
+                row = self._db.execute(query, (key[1],)).fetchone()
+                if row is None or row[1] <= now:
+                    return MISSING
+                value = decode(row[0])
+            except (sqlite3.Error, zlib.error, UnicodeDecodeError):
+                return MISSING
+            self._remember(key, row[1], value)
+            return value
+
+    def _put(self, key, statement, stored, value, ttl):
+        expires = time() + ttl
+        with self._lock:
+            self._remember(key, expires, value)
+            if self._db is None:
+                return
+            try:
+                self._db.execute(statement, (key[1], stored, expires))
+                self._db.commit()
+            except sqlite3.Error:
+                pass
+
+    def get_track_id(self, isrc):
+        return self._get(('isrc', isrc), "SELECT sng_id, expires FROM track_ids WHERE isrc = ?", lambda sng_id: sng_id)
+
+    def put_track_id(self, isrc, sng_id):
+        sng_id = str(sng_id) if sng_id else None
+        self._put(('isrc', isrc), "INSERT OR REPLACE INTO track_ids (isrc, sng_id, expires) VALUES (?, ?, ?)",
+                  sng_id, sng_id, TRACK_ID_TTL if sng_id else MISSING_TTL)
+
+    def get_lyrics(self, sng_id):
+        return self._get(('lyrics', str(sng_id)), "SELECT body, expires FROM lyrics WHERE sng_id = ?",
+                         lambda body: zlib.decompress(body).decode('utf-8') if body is not None else None)
+
+    def put_lyrics(self, sng_id, lyrics):
+        body = zlib.compress(lyrics.encode('utf-8')) if lyrics else None
+        self._put(('lyrics', str(sng_id)), "INSERT OR REPLACE INTO lyrics (sng_id, body, expires) VALUES (?, ?, ?)",
+                  body, lyrics or None, LYRICS_TTL if lyrics else MISSING_TTL)
+
+    def purge(self):
+        """Drops the expired entries from the database"""
+        now = time()
+        with self._lock:
+            if self._db is None:
+                return
+            try:
+                self._db.execute("DELETE FROM track_ids WHERE expires <= ?", (now,))
+                self._db.execute("DELETE FROM lyrics WHERE expires <= ?", (now,))
+                self._db.commit()
+            except sqlite3.Error:
+                pass
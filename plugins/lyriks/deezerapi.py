@@ -1,8 +1,84 @@
-from time import sleep
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from time import monotonic
 
 import requests
+from PyQt5 import QtCore
+from picard import log
+from requests.adapters import HTTPAdapter
 
+from .cache import MISSING, LyricsCache
 from .lyricsapi import LyricsAPI
+from .ratelimit import HostRateLimiter
+from .retry import RetryPolicy
+
+API_HOST = 'api.deezer.com'
+GW_HOST = 'www.deezer.com'
+# Requests to Deezer made at the same time, by as many worker threads over as many pooled connections
+MAX_IN_FLIGHT = 8
+# Requests per second and host; the public API allows 50 requests per 5 seconds
+HOST_RATES = {API_HOST: 10.0, GW_HOST: 10.0}
+
+# How long a gw-light session token (checkForm) is reused before it is fetched again, in seconds
+TOKEN_TTL = 3600
+# gw-light error returned for a missing, expired or invalid token
+TOKEN_ERROR = 'VALID_TOKEN_REQUIRED'
+# Errors worth retrying: gw-light error names, and codes of the public API (quota exceeded, service busy)
+TRANSIENT_ERRORS = (TOKEN_ERROR, 'GATEWAY_ERROR', 'QUOTA_ERROR')
+TRANSIENT_ERROR_CODES = (4, 700)
+# How long calls refused with any other error are answered with None without asking Deezer again, in seconds
+NEGATIVE_TTL = 6 * 3600
+# Refused calls remembered at most; all wait NEGATIVE_TTL, so the oldest is the first to expire
+NEGATIVE_ENTRIES = 1000
+
+
+def cache_path():
+    return os.path.join(QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.CacheLocation),
+                        "lyriks", "deezer.sqlite")
+
+
+class DeezerError(Exception):
+
+    def __init__(self, error):
+        super().__init__(error)
+        self.error = error
+
+    @property
+    def transient(self):
+        if isinstance(self.error, dict):
+            return self.error.get('code') in TRANSIENT_ERROR_CODES or any(
+                name in self.error for name in TRANSIENT_ERRORS)
+        return False
+
+
+class TokenManager:
+    """Fetches the gw-light session token once and shares it between threads until it expires or is refused"""
+
+    def __init__(self, fetch, ttl=TOKEN_TTL, clock=monotonic):
+        self._fetch = fetch
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires = 0
+
+    def get(self):
+        with self._lock:
+            if self._token is None or self._clock() >= self._expires:
+                # Threads asking meanwhile wait for this fetch instead of making their own
+                self._token = self._fetch()
+                self._expires = self._clock() + self._ttl
+            return self._token
+
+    def invalidate(self, token):
+        with self._lock:
+            # Another thread may already have replaced the refused token
+            if token == self._token:
+                self._token = None
 
 
 class DeezerAPI(LyricsAPI):
@@ -18,6 +94,23 @@ class DeezerAPI(LyricsAPI):
                 "Accept-Language": "*"
             }
             self.session = requests.session()
+            adapter = HTTPAdapter(pool_connections=len(HOST_RATES), pool_maxsize=MAX_IN_FLIGHT)
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+            self.rate_limiter = HostRateLimiter(HOST_RATES)
+            self.executor = ThreadPoolExecutor(max_workers=MAX_IN_FLIGHT, thread_name_prefix='lyriks')
+            self.token = TokenManager(self.fetch_token)
+            self.retry = RetryPolicy()
+            # Calls which will not succeed, with the time they may be tried again, oldest first
+            self.failed = OrderedDict()
+            self.failed_lock = threading.Lock()
+            self.cache = LyricsCache(cache_path())
+            self.cache.purge()
+            # The worker threads are joined at exit after running every queued job, which are rate limited and
+            # retried, so the queue is dropped when Picard quits
+            app = QtCore.QCoreApplication.instance()
+            if app is not None:
+                app.aboutToQuit.connect(self.shutdown)
         else:
             raise Exception('API object cannot be initialised more than once.')
 
@@ -29,6 +122,18 @@ class DeezerAPI(LyricsAPI):
         else:
             return DeezerAPI.__instance__
 
+    def shutdown(self):
+        """Cancels the queued jobs and stops the worker pool without waiting for the running ones"""
+        try:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        except TypeError:
+            # Python < 3.9 cannot cancel the queued jobs
+            self.executor.shutdown(wait=False)
+
+    def submit(self, func, *args):
+        """Runs func(*args) in the client's worker pool, returning a concurrent.futures.Future"""
+        return self.executor.submit(func, *args)
+
     @staticmethod
     def as_params(dct):
         return {'params': dct}
@@ -37,28 +142,67 @@ class DeezerAPI(LyricsAPI):
     def as_args(dct):
         return {'args': dct}
 
-    def call_simple_api(self, entity, query):
-        # noinspection PyBroadException
+    @staticmethod
+    def is_transient(error):
+        if isinstance(error, DeezerError):
+            return error.transient
+        # Connection failures, timeouts and responses which are not JSON (error pages)
+        return isinstance(error, (requests.RequestException, ValueError))
+
+    def call_with_retry(self, key, call, refused=None):
+        # Returns ``refused`` if Deezer refused the call with an error retrying won't fix, None if it failed
+        # otherwise. Other errors are bugs and raised.
+        with self.failed_lock:
+            retry_at = self.failed.get(key)
+            if retry_at is not None:
+                if retry_at > monotonic():
+                    return refused
+                del self.failed[key]
         try:
-            response = self.session.get(
-                'https://api.deezer.com/{}/{}'.format(entity, query),
-                timeout=15,
-                headers=self.headers
-            )
-            response_json = response.json()
-            print(response.url)
-            print(response_json)
-            if 'error' in response_json and len(response_json['error']):
-                raise Exception
-            return response_json
-        except Exception:
+            return self.retry.run(call, self.is_transient)
+        except DeezerError as e:
+            if e.transient:
+                log.warning("Lyriks: Deezer call %r failed: %s", key, e)
+                return None
+            log.warning("Lyriks: Deezer refused call %r, not asking again for %d h: %s", key,
+                        NEGATIVE_TTL // 3600, e)
+            with self.failed_lock:
+                self.failed[key] = monotonic() + NEGATIVE_TTL
+                self.failed.move_to_end(key)
+                while len(self.failed) > NEGATIVE_ENTRIES:
+                    self.failed.popitem(last=False)
+            return refused
+        except (requests.RequestException, ValueError) as e:
+            log.warning("Lyriks: Deezer call %r failed: %s", key, e)
             return None
 
-    def call_api(self, call_type, payload=None):
+    def call_simple_api(self, entity, query, refused=None):
+        return self.call_with_retry(('simple', entity, query), partial(self.call_simple_api_once, entity, query),
+                                    refused)
+
+    def call_simple_api_once(self, entity, query):
+        self.rate_limiter.wait(API_HOST)
+        response = self.session.get(
+            'https://{}/{}/{}'.format(API_HOST, entity, query),
+            timeout=15,
+            headers=self.headers
+        )
+        log.debug("Lyriks: %s %s", response.status_code, response.url)
+        response_json = response.json()
+        if 'error' in response_json and len(response_json['error']):
+            raise DeezerError(response_json['error'])
+        return response_json
+
+    def call_api(self, call_type, payload=None, refused=None):
+        key = (call_type, json.dumps(payload, sort_keys=True))
+        return self.call_with_retry(key, partial(self.call_api_once, call_type, payload), refused)
+
+    def call_api_once(self, call_type, payload=None):
         args = {}
+        token = 'null' if call_type == 'deezer.getUserData' else self.set_auth()
         params = {
             'api_version': '1.0',
-            'api_token': 'null' if call_type == 'deezer.getUserData' else self.set_auth(),
+            'api_token': token,
             'input': '3',
             'method': call_type
         }
@@ -68,50 +212,127 @@ class DeezerAPI(LyricsAPI):
             if 'params' in payload:
                 params.update(payload['params'])
 
-        # noinspection PyBroadException
-        try:
-            response = self.session.post(
-                "http://www.deezer.com/ajax/gw-light.php",
-                params=params,
-                timeout=15,
-                json=args,
-                headers=self.headers
-            )
-            response_json = response.json()
-            print(response.url)
-            print(response_json)
-            if 'error' in response_json and len(response_json['error']):
-                sleep(2)
-                return self.call_api(call_type, payload)
-            return response_json['results']
-        except Exception:
-            return None
+        self.rate_limiter.wait(GW_HOST)
+        response = self.session.post(
+            "http://{}/ajax/gw-light.php".format(GW_HOST),
+            params=params,
+            timeout=15,
+            json=args,
+            headers=self.headers
+        )
+        # Not the URL, it carries the session token
+        log.debug("Lyriks: %s %s", response.status_code, call_type)
+        response_json = response.json()
+        if 'error' in response_json and len(response_json['error']):
+            if isinstance(response_json['error'], dict) and TOKEN_ERROR in response_json['error']:
+                self.token.invalidate(token)
+            raise DeezerError(response_json['error'])
+        return response_json['results']
 
     def get_user_data(self):
         return self.call_api('deezer.getUserData')
 
+    def fetch_token(self):
+        # A single attempt, made while the other threads wait for it: if it fails, so does the call needing the
+        # token, and the retries of that call fetch it again
+        token = self.call_api_once('deezer.getUserData').get('checkForm')
+        if not token:
+            raise DeezerError({TOKEN_ERROR: 'no checkForm in the user data'})
+        return token
+
     def set_auth(self, payload=None):
-        user_data = self.get_user_data()
-        return user_data['checkForm'] if user_data else None
+        return self.token.get()
 
     def search_isrc(self, isrc):
-        return self.call_simple_api('track', 'isrc:{}'.format(isrc))
+        # An unknown ISRC is answered with {}, a failed search with None
+        return self.call_simple_api('track', 'isrc:{}'.format(isrc), refused={})
 
     def search_id(self, track_name):
         pass
 
     def get_lyrics_id(self, track_id):
-        lyrics_raw = self.call_api('song.getLyrics', self.as_args({'sng_id': track_id}))
-        if lyrics_raw:
-            return self.parse_lyrics(lyrics_raw)
-        return lyrics_raw
+        lyrics = self.cache.get_lyrics(track_id)
+        if lyrics is not MISSING:
+            return lyrics
+        lyrics_raw = self.call_api('song.getLyrics', self.as_args({'sng_id': track_id}), refused={})
+        if lyrics_raw is None:
+            # Failed, but might work next time; nothing is cached
+            return None
+        lyrics = self.parse_lyrics(lyrics_raw) if lyrics_raw else None
+        self.cache.put_lyrics(track_id, lyrics)
+        return lyrics
 
     def get_lyrics_isrc(self, isrc):
-        track_id = self.search_isrc(isrc.replace('-', '')).get('id')
+        isrc = isrc.replace('-', '')
+        track_id = self.cache.get_track_id(isrc)
+        if track_id is MISSING:
+            track = self.search_isrc(isrc)
+            if track is None:
+                return None
+            track_id = track.get('id')
+            self.cache.put_track_id(isrc, track_id)
         if track_id:
             return self.get_lyrics_id(track_id)
         return None
 
+    def get_lyrics_isrcs(self, isrcs):
+        # The ISRCs are alternatives for one recording, the first one with lyrics wins
+        for isrc in isrcs:
+            lyrics = self.get_lyrics_isrc(isrc)
+            if lyrics:
+                return lyrics
+        return None
+
+    def get_album_track_ids(self, upc):
+        """Returns {ISRC: track id} of the tracks of the Deezer album with barcode ``upc``"""
+        album = self.call_simple_api('album', 'upc:{}'.format(upc), refused={})
+        if not album or not album.get('id'):
+            return {}
+        tracks = self.call_simple_api('album', '{}/tracks?limit=1000'.format(album['id']), refused={})
+        return {track['isrc']: track['id'] for track in (tracks or {}).get('data', [])
+                if track.get('isrc') and track.get('id')}
+
+    def resolve_album(self, upc, isrcs):
+        # One album lookup stores the track ids of all its ISRCs; those it doesn't know are searched one by one
+        isrcs = [isrc.replace('-', '') for isrc in isrcs]
+        if upc and any(self.cache.get_track_id(isrc) is MISSING for isrc in isrcs):
+            for isrc, track_id in self.get_album_track_ids(upc).items():
+                self.cache.put_track_id(isrc, track_id)
+
+    def fetch_album_lyrics(self, upc, tracks, callback):
+        """Fetches the lyrics of the tracks of a release in one batch.
+
+        ``tracks`` maps a key per track to its ISRCs. The Deezer track ids are resolved through the album
+        with barcode ``upc`` first, then the lyrics of all tracks are fetched through the worker pool.
+        callback({key: lyrics or None}) is called from a worker thread once all are done.
+        """
+        results = {}
+        lock = threading.Lock()
+
+        def fetched(key, future):
+            try:
+                lyrics = future.result()
+            except Exception as e:
+                log.error("Lyriks: fetching the lyrics of %s failed: %s", key, e)
+                lyrics = None
+            with lock:
+                results[key] = lyrics
+                done = len(results) == len(tracks)
+            if done:
+                callback(results)
+
+        def resolved(future):
+            if future.exception() is not None:
+                # The tracks are still searched one by one
+                log.error("Lyriks: resolving the album %s failed: %s", upc, future.exception())
+            if not tracks:
+                callback(results)
+            for key, isrcs in tracks.items():
+                self.submit(self.get_lyrics_isrcs, isrcs).add_done_callback(partial(fetched, key))
+
+        all_isrcs = [isrc for isrcs in tracks.values() for isrc in isrcs]
+        self.submit(self.resolve_album, upc, all_isrcs).add_done_callback(resolved)
+
     def parse_lyrics(self, lyrics):
         sync_lst = []
         sync = ''
@@ -0,0 +1,23 @@
+import threading
+from time import monotonic, sleep
+
+
+class HostRateLimiter:
+    """Spaces the requests to each host at least 1 / rate seconds apart, across all threads"""
+
+    def __init__(self, rates, default_rate=10.0, clock=monotonic, wait=sleep):
+        self.rates = dict(rates)
+        self.default_rate = default_rate
+        self._clock = clock
+        self._wait = wait
+        self._lock = threading.Lock()
+        self._next = {}
+
+    def wait(self, host):
+        # The slot is reserved under the lock, the waiting for it happens outside
+        with self._lock:
+            now = self._clock()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + 1.0 / self.rates.get(host, self.default_rate)
+        if slot > now:
+            self._wait(slot - now)
@@ -0,0 +1,33 @@
+import random
+from time import sleep
+
+
+class RetryPolicy:
+    """Retries a failing call a bounded number of times, backing off exponentially with jitter in between"""
+
+    def __init__(self, max_attempts=3, base_delay=1.0, max_delay=8.0, rand=random.random, wait=sleep):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rand = rand
+        self._wait = wait
+
+    def delay(self, attempt):
+        # A random half of the delay is dropped, so calls which failed together are not retried together
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay / 2 + self._rand() * delay / 2
+
+    def run(self, func, is_transient):
+        """Returns func(), calling it again while it raises an error is_transient(error) accepts.
+
+        The last error is raised once max_attempts calls failed, other errors at once.
+        """
+        attempt = 1
+        while True:
+            try:
+                return func()
+            except Exception as error:
+                if attempt >= self.max_attempts or not is_transient(error):
+                    raise
+            self._wait(self.delay(attempt))
+            attempt += 1
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+"""Fills the Last.fm.Plus tag cache ahead of a tagging session.
+
+Reads the artist and title tags of an existing library, or a plain list, and requests their Last.fm tags into
+the plugin's cache database, so Picard finds them there instead of waiting on the rate limit.
+
+    python tools/lastfmplus/warmup.py --api-key KEY [--cache PATH] [--list FILE] [DIRECTORY ...]
+
+A list file holds one "artist<TAB>title" per line (the title is optional). Directories are scanned with
+mutagen. Lookups already in the cache are skipped, and finished ones are recorded in a checkpoint file, so an
+interrupted run continues where it stopped. Run it while Picard is closed, or on another copy of the cache.
+If the plugin looks up versions of a track once, pass --normalise-titles (and the same --title-suffixes).
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# The plugin's helper modules are imported on their own, the package itself needs Picard
+sys.path.insert(0, os.path.join(HERE, os.pardir, os.pardir, "plugins", "lastfmplus_sonemicwl"))
+
+from normalise import DEFAULT_TITLE_SUFFIXES, TitleNormaliser  # noqa: E402
+from parsers import LastfmError, parse_toptags_json  # noqa: E402
+from ratelimit import TokenBucket, backoff_delay  # noqa: E402
+from tagcache import DAY, TagCache, make_cachetag  # noqa: E402
+from vocab import TagVocabulary  # noqa: E402
+
+LASTFM_URL = "http://ws.audioscrobbler.com/2.0/"
+# Same limits and error handling as the plugin, see lastfmplus_sonemicwl/__init__.py
+LASTFM_RATE = 5.0
+LASTFM_RATE_WINDOW = 300
+LASTFM_TRANSIENT_ERRORS = (8, 11, 16, 29)
+LASTFM_ERROR_RATE_LIMIT = 29
+LASTFM_ERROR_NOT_FOUND = 6
+MAX_ATTEMPTS = 3
+RETRY_DELAY = 2.0
+RETRY_MAX_DELAY = 30.0
+
+
+def default_cache_path():
+    """Path of the cache database of a default Picard installation"""
+    try:
+        from PyQt5 import QtCore
+    except ImportError:
+        sys.exit("Finding Picard's cache database needs PyQt5; use --cache otherwise")
+    QtCore.QCoreApplication.setOrganizationName("MusicBrainz")
+    QtCore.QCoreApplication.setApplicationName("Picard")
+    return os.path.join(QtCore.QStandardPaths.writableLocation(QtCore.QStandardPaths.CacheLocation),
+                        "lastfmplus", "tags.sqlite")
+
+
+def read_list(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\r\n").split("\t")
+            artist = parts[0].strip()
+            title = parts[1].strip() if len(parts) > 1 else ""
+            if artist:
+                yield artist, title
+
+
+def scan_library(directory):
+    try:
+        import mutagen
+    except ImportError:
+        sys.exit("Scanning a library needs mutagen (pip install mutagen); use --list otherwise")
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for filename in sorted(files):
+            try:
+                audio = mutagen.File(os.path.join(root, filename), easy=True)
+            except Exception:
+                continue
+            if audio is None or not audio.tags:
+                continue
+            for artist in audio.tags.get("artist", [])[:1]:
+                titles = audio.tags.get("title", [])
+                yield artist.strip(), titles[0].strip() if titles else ""
+
+
+def collect_lookups(pairs, artists=True, tracks=True, normaliser=None):
+    """Returns the distinct lookups of the (artist, title) pairs, artists first.
+
+    A lookup is an (artist, title, title key) tuple, the title and its key None for artist lookups. With a
+    TitleNormaliser, titles are looked up without their version suffixes and keyed the way the plugin does.
+    """
+    artist_lookups = []
+    track_lookups = []
+    seen = set()
+    for artist, title in pairs:
+        if artists and (artist, None) not in seen:
+            seen.add((artist, None))
+            artist_lookups.append((artist, None, None))
+        if tracks and title:
+            key = title
+            if normaliser is not None:
+                title = normaliser.strip(title)
+                key = normaliser.key(title)
+            if (artist, key) not in seen:
+                seen.add((artist, key))
+                track_lookups.append((artist, title, key))
+    return artist_lookups + track_lookups
+
+
+def format_duration(seconds):
+    """Formats seconds as H:MM:SS, the hours not wrapping after a day.
+
+    >>> format_duration(93784.5)
+    '26:03:04'
+    """
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return "%d:%02d:%02d" % (hours, minutes, seconds)
+
+
+class Checkpoint(object):
+    """Cache keys finished by earlier runs, one per line"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.done = {line.rstrip("\n") for line in f}
+        self._file = open(path, "a", encoding="utf-8") if path else None
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def add(self, key):
+        self.done.add(key)
+        if self._file is not None:
+            self._file.write(key.replace("\n", " ") + "\n")
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def fetch(api_key, artist, title):
+    """Requests the toptags of a lookup; returns (status, body), status None if the connection failed"""
+    queryargs = {"api_key": api_key, "artist": artist, "method": "Artist.getTopTags", "format": "json"}
+    if title:
+        queryargs["method"] = "Track.getTopTags"
+        queryargs["track"] = title
+    try:
+        with urlopen(LASTFM_URL + "?" + urlencode(queryargs), timeout=30) as response:
+            return response.status, response.read()
+    except HTTPError as e:
+        return e.code, e.read()
+    except (URLError, OSError):
+        return None, b""
+
+
+def is_transient(status, error):
+    """Tells if a failed request may succeed when retried, like the plugin does"""
+    if isinstance(error, LastfmError):
+        return error.code in LASTFM_TRANSIENT_ERRORS
+    return status is None or status == 429 or status >= 500
+
+
+class Warmup(object):
+
+    def __init__(self, args, cache):
+        self.args = args
+        self.cache = cache
+        self.rate = TokenBucket(args.rate - float(args.burst) / LASTFM_RATE_WINDOW, args.burst)
+        self.counts = {"cached": 0, "empty": 0, "failed": 0, "skipped": 0}
+
+    def lookup(self, key, artist, title):
+        """Requests one lookup into the cache, retrying transient failures; returns its outcome"""
+        negative_ttl = self.args.negative_ttl_days * DAY
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            time.sleep(self.rate.reserve())
+            status, body = fetch(self.args.api_key, artist, title)
+            try:
+                name_to_count = parse_toptags_json(body, self.args.max_parsed_tags)
+                if status == 200:
+                    error = None
+                else:
+                    error = "HTTP status %d" % status if status else "connection failed"
+            except LastfmError as e:
+                name_to_count = {}
+                error = e
+            if not error:
+                self.rate.succeeded()
+                tag_to_count = self.cache.decode(name_to_count)
+                self.cache.put(key, tag_to_count, ttl=None if tag_to_count else negative_ttl)
+                return "cached" if tag_to_count else "empty"
+            if status == 429 or (isinstance(error, LastfmError) and error.code == LASTFM_ERROR_RATE_LIMIT):
+                if self.rate.throttled():
+                    print("Last.fm rate limit exceeded, slowing down to %.2f requests/s" % self.rate.rate,
+                          file=sys.stderr)
+            if isinstance(error, LastfmError) and error.code == LASTFM_ERROR_NOT_FOUND:
+                self.cache.put(key, {}, ttl=negative_ttl)
+                return "empty"
+            if not is_transient(status, error):
+                break
+            if attempt < MAX_ATTEMPTS:
+                time.sleep(backoff_delay(attempt, RETRY_DELAY, RETRY_MAX_DELAY))
+        print("%s: %s" % (key.replace("\t", " / "), error), file=sys.stderr)
+        return "failed"
+
+    def run(self, lookups, checkpoint):
+        pending = []
+        for artist, title, title_key in lookups:
+            key = make_cachetag("Track.getTopTags" if title else "Artist.getTopTags", artist, title_key)
+            if key in checkpoint or key in self.cache:
+                self.counts["skipped"] += 1
+            else:
+                pending.append((key, artist, title))
+        total = len(pending)
+        print("%d lookups, %d already cached or done, %d to request" % (len(lookups), self.counts["skipped"], total))
+        start = time.monotonic()
+        last_report = 0
+        for done, (key, artist, title) in enumerate(pending, 1):
+            outcome = self.lookup(key, artist, title)
+            self.counts[outcome] += 1
+            # Failed lookups are tried again on the next run
+            if outcome != "failed":
+                checkpoint.add(key)
+            now = time.monotonic()
+            if now - last_report >= self.args.progress or done == total:
+                last_report = now
+                rate = done / (now - start) if now > start else 0.0
+                eta = (total - done) / rate if rate else 0.0
+                print("%d/%d (%.1f%%), %.2f lookups/s, ETA %s, %s" % (
+                    done, total, 100.0 * done / total, rate, format_duration(eta),
+                    json.dumps(self.counts)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directories", nargs="*", help="library directories to scan with mutagen")
+    parser.add_argument("--list", action="append", default=[], metavar="FILE",
+                        help='file of "artist<TAB>title" lines')
+    parser.add_argument("--api-key", default=os.environ.get("LASTFM_API_KEY"),
+                        help="Last.fm API key (default: $LASTFM_API_KEY)")
+    parser.add_argument("--cache", help="cache database (default: the one of a default Picard installation, "
+                                        "found with PyQt5)")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: next to the cache database)")
+    parser.add_argument("--no-artists", action="store_true", help="skip artist lookups")
+    parser.add_argument("--no-tracks", action="store_true", help="skip track lookups")
+    parser.add_argument("--normalise-titles", action="store_true",
+                        help="look up versions of a track once, like the plugin option")
+    parser.add_argument("--title-suffixes", default=DEFAULT_TITLE_SUFFIXES,
+                        help="version words dropped from titles with --normalise-titles")
+    parser.add_argument("--rate", type=float, default=LASTFM_RATE, help="average requests per second")
+    parser.add_argument("--burst", type=int, default=20, help="requests sent without delay after a pause")
+    parser.add_argument("--ttl-days", type=int, default=30)
+    parser.add_argument("--negative-ttl-days", type=int, default=3)
+    parser.add_argument("--max-entries", type=int, default=50000)
+    parser.add_argument("--max-parsed-tags", type=int, default=100)
+    parser.add_argument("--progress", type=float, default=10.0, help="seconds between progress reports")
+    args = parser.parse_args()
+    if not args.api_key:
+        parser.error("a Last.fm API key is needed (--api-key or $LASTFM_API_KEY)")
+    if not args.directories and not args.list:
+        parser.error("nothing to read, give library directories or --list")
+
+    cache_path = args.cache or default_cache_path()
+    checkpoint_path = args.checkpoint or cache_path + ".warmup"
+    pairs = []
+    for path in args.list:
+        pairs.extend(read_list(path))
+    for directory in args.directories:
+        pairs.extend(scan_library(directory))
+    normaliser = TitleNormaliser(args.title_suffixes) if args.normalise_titles else None
+    lookups = collect_lookups(pairs, artists=not args.no_artists, tracks=not args.no_tracks, normaliser=normaliser)
+
+    def cache_failed(error):
+        sys.exit("Cannot use the cache database %s: %s" % (cache_path, error))
+
+    # The names are stored normalised the same way the plugin stores them
+    vocabulary = TagVocabulary()
+    cache = TagCache(cache_path, ttl=args.ttl_days * DAY, max_entries=args.max_entries, on_error=cache_failed,
+                     encode=vocabulary.encode, decode=vocabulary.decode)
+    checkpoint = Checkpoint(checkpoint_path)
+    try:
+        Warmup(args, cache).run(lookups, checkpoint)
+    except KeyboardInterrupt:
+        print("Interrupted, run again to continue")
+    finally:
+        checkpoint.close()
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()